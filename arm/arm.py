@@ -10,6 +10,56 @@ Includes an array of joints and an array of links, which are used to
 calculate the forward kinematics of the arm.
 """
 
+def batch_forward_kinematics(
+        pos: np.ndarray,
+        link_length: float,
+        configs: np.ndarray,
+        return_links: bool = False,
+) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Compute the forward kinematics of many joint configurations at once
+
+    Args:
+    - pos: The base position of the arm, shape (2,), or one per configuration, shape (N, 2)
+    - link_length: The length of each link, or one per configuration, shape (N,)
+    - configs: The joint configurations, shape (N, num_links)
+    - return_links: Whether to also return the link starting positions
+
+    Returns:
+    - The end effector positions, shape (N, 2)
+    - (if return_links) The link starting positions, shape (N, num_links, 2)
+    """
+    configs = np.asarray(configs, dtype=np.float64)
+    if configs.ndim != 2:
+        raise ValueError("configs must have shape (N, num_links)")
+
+    pos = np.asarray(pos, dtype=np.float64)
+    link_length = np.asarray(link_length, dtype=np.float64)
+
+    # Absolute angle of each link (see Arm.__update_links)
+    angles = np.cumsum(configs, axis=1)
+
+    # Vector of each link from its start to its end
+    offsets = np.empty(configs.shape + (2,), dtype=np.float64)
+    np.cos(angles, out=offsets[..., 0])
+    np.sin(angles, out=offsets[..., 1])
+    offsets *= link_length.reshape(-1, 1, 1) if link_length.ndim else link_length
+
+    # End position of every link
+    ends = np.cumsum(offsets, axis=1)
+    ends += pos[:, np.newaxis] if pos.ndim == 2 else pos
+    end_effectors = ends[:, -1]
+
+    if not return_links:
+        return end_effectors
+
+    links = np.empty_like(ends)
+    links[:, 0] = pos
+    links[:, 1:] = ends[:, :-1]
+
+    return end_effectors, links
+
+
 class Arm:
     # Rotation limits
     ROT_START = -np.pi / 2
@@ -45,6 +95,13 @@ class Arm:
         # Iteratively update link positions
         self.__update_links()
     
+    @property
+    def link_length(self) -> float:
+        """
+        The length of each link
+        """
+        return self.__link_length
+
     def set_joint_angles(self, angles: np.ndarray) -> None:
         """
         Set the joint angles
@@ -56,6 +113,20 @@ class Arm:
         angles = Arm.ROT_START + (angles - Arm.ROT_START) % range_size
 
         self.__update_links()
+
+    def set_joints(self, joints: np.ndarray) -> None:
+        """
+        Copy joint angles into the arm, as they are, and update the links
+
+        Args:
+        - joints: The new joint angles, shape (num_links,)
+        """
+        if joints.shape != self.joints.shape:
+            raise ValueError("joints must have the same shape as self.joints")
+
+        # In place, so references to self.joints stay valid
+        self.joints[:] = joints
+        self.__update_links()
     
     def __update_links(self, start=1) -> None:
         """
@@ -64,14 +135,16 @@ class Arm:
 
         Optionally, only update links starting from a certain index
         """
-        # We get the sum of the joints up to the current index
-        # because as we iterate through the joints, we want to
-        # get the sum of the previous joints
+        # The absolute angle of each link is the sum of the joints
+        # up to and including it, since the north-line of the arm,
+        # whilst initially 0, adjusts depending on the angle of the
+        # previous joint. A cumulative sum gives every absolute angle
+        # at once, and a cumulative sum of the resulting link vectors
+        # gives every link end position at once.
         #
-        # We do this since the north-line of the arm, whilst initially
-        # 0, adjusts depending on the angle of the previous joint.
-        # As such, we need to get the sum of the previous joints to
-        # get the correct angle of the current joint
+        # The end of link i is the start of link i + 1, and the end
+        # of the last link is the end effector, so both are produced
+        # by the same pass.
 
         if start < 1:
             raise ValueError("start must be greater than 1")
@@ -79,73 +152,91 @@ class Arm:
         # first set the starting position of the first link
         self.links[0] = self.pos
 
-        for i in range(start, self.num_links):
-            # Get end position of previous link
-            prev_end = self.__get_end_pos(i - 1)
+        # Absolute angle of each link
+        angles = np.cumsum(self.joints)
 
-            # Set to current
-            self.links[i] = prev_end
-    
-    def __get_end_pos(self, idx: int) -> np.ndarray:
-        """
-        Get the end position of a link at a given index
-        """
-        start = self.links[idx]
+        # Vector of each link from its start to its end
+        offsets = np.empty((self.num_links, 2), dtype=np.float64)
+        np.cos(angles, out=offsets[:, 0])
+        np.sin(angles, out=offsets[:, 1])
+        offsets *= self.__link_length
 
-        # Get sum of joints up to the current index
-        # See __update_links() for explanation
-        angle = np.sum(self.joints[:idx + 1])
+        # End position of each link from start - 1 onwards
+        ends = self.links[start - 1] + np.cumsum(offsets[start - 1:], axis=0)
 
-        # Get the end position
-        end = start + np.array([
-            np.cos(angle),
-            np.sin(angle),
-        ]) * self.__link_length
+        self.links[start:] = ends[:-1]
+        self.__end_effector = ends[-1]
 
-        return end
-        
-    def draw(self, surface: pygame.Surface) -> None:
+    def draw(self, surface: pygame.Surface) -> pygame.Rect:
         """
         Draw the arm
+
+        Returns:
+        - The area drawn on
         """
-        # Draw links
-        for i in range(self.num_links):
-            if i == self.num_links - 1:
-                end = self.get_end_effector_pos()
-            else:
-                end = self.links[i + 1]
+        end_effector = self.__end_effector.tolist()
+        joints = self.links.tolist()
+
+        # Draw links, as one polyline through every joint
+        rect = pygame.draw.lines(
+            surface,
+            self.__color,
+            False,
+            joints + [end_effector],
+            const.ARM_WIDTH,
+        )
 
-            pygame.draw.line(
-                surface,
-                self.__color,
-                self.links[i],
-                end,
-                const.ARM_WIDTH,
-            )
-        
         # Draw joints
-        for i in range(self.num_links):
+        for joint in joints:
             pygame.draw.circle(
                 surface,
                 self.__joint_color,
-                self.links[i],
+                joint,
                 const.ARM_WIDTH,
             )
-        
+
         # Draw end point of arm
         pygame.draw.circle(
             surface,
             (0, 255, 0),
-            self.get_end_effector_pos(),
+            end_effector,
             const.ARM_WIDTH,
         )
+
+        # The joints stick out past the ends of the links
+        grow = 2 * const.ARM_WIDTH + 2
+        return rect.inflate(grow, grow).clip(surface.get_rect())
     
     def get_end_effector_pos(self) -> np.ndarray:
         """
         Get the end effector position
         """
-        return self.__get_end_pos(self.num_links - 1)
+        # Copy so callers (e.g. held balls) can't mutate the arm
+        return self.__end_effector.copy()
     
+    def forward_kinematics(
+            self,
+            configs: np.ndarray,
+            return_links: bool = False,
+    ) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Compute the forward kinematics of many joint configurations
+        for this arm without changing its pose
+
+        Args:
+        - configs: The joint configurations, shape (N, num_links)
+        - return_links: Whether to also return the link starting positions
+
+        Returns:
+        - The end effector positions, shape (N, 2)
+        - (if return_links) The link starting positions, shape (N, num_links, 2)
+        """
+        configs = np.asarray(configs, dtype=np.float64)
+        if configs.ndim != 2 or configs.shape[1] != self.num_links:
+            raise ValueError("configs must have shape (N, num_links)")
+
+        return batch_forward_kinematics(self.pos, self.__link_length, configs, return_links)
+
     def update(self, dt: float) -> None:
         """
         Update the arm
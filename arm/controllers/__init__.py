@@ -1,3 +1,11 @@
 from typing import *
 
-from .sgd import SGDController
\ No newline at end of file
+from .sgd import SGDController
+from .jacobian import JacobianController
+from .dls import DLSController
+from .fabrik import FABRIKController
+from .ccd import CCDController
+from .cache import SolutionCache, CachedController
+from .batch import BatchDLSController
+from .multistart import MultiStartController
+from .reach import ReachController
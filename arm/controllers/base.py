@@ -1,4 +1,5 @@
 from typing import *
+import numpy as np
 
 class Controller:
     """
@@ -8,4 +9,34 @@ class Controller:
         pass
     
     def update(self, arm: Any, dt: float) -> None:
-        pass
\ No newline at end of file
+        pass
+
+    def is_reachable(self, arm: Any, target: Any) -> bool:
+        """
+        Check if the controller can move the arm to a target
+        """
+        return True
+
+    def get_state(self, arms: Sequence[Any]) -> np.ndarray:
+        """
+        Get everything the controller carries from one update to the
+        next that changes what it does, for snapshots
+
+        Args:
+        - arms: The arms of the simulation
+
+        Returns:
+        - The state, always the same length for the same arms,
+          empty for controllers which carry nothing
+        """
+        return np.zeros(0, dtype=np.float64)
+
+    def set_state(self, arms: Sequence[Any], state: np.ndarray) -> None:
+        """
+        Restore the state from get_state
+
+        Args:
+        - arms: The arms of the simulation
+        - state: The state
+        """
+        pass
@@ -0,0 +1,203 @@
+from __future__ import annotations
+from typing import *
+from collections import defaultdict
+import numpy as np
+from arm.arm import batch_forward_kinematics
+from arm.controllers.base import Controller
+
+"""
+Damped Least Squares controller that solves many arms at once
+"""
+
+def batch_jacobian(end_effectors: np.ndarray, links: np.ndarray) -> np.ndarray:
+    """
+    Compute the Jacobian of many arms at once
+    (see arm.controllers.jacobian.compute_jacobian)
+
+    Args:
+    - end_effectors: The end effector positions, shape (N, 2)
+    - links: The link starting positions, shape (N, num_links, 2)
+
+    Returns:
+    - The Jacobians, shape (N, 2, num_links)
+    """
+    r = end_effectors[:, np.newaxis] - links
+
+    jacobian = np.empty((links.shape[0], 2, links.shape[1]), dtype=np.float64)
+    jacobian[:, 0] = -r[..., 1]
+    jacobian[:, 1] = r[..., 0]
+
+    return jacobian
+
+
+def batch_dls(
+        joints: np.ndarray,
+        bases: np.ndarray,
+        lengths: Union[float, np.ndarray],
+        targets: np.ndarray,
+        damping: float = 1.0,
+        tolerance: float = 1.0,
+        max_iterations: int = 50,
+        damping_up: float = 10.0,
+        damping_down: float = 0.5,
+        max_damping: float = 1e6,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Run damped least squares on many joint configurations at once
+    (see BatchDLSController for the arguments)
+
+    Args:
+    - joints: The starting joint angles, shape (N, num_links)
+    - bases: The base positions, shape (2,) or (N, 2)
+    - lengths: The link lengths, a float or shape (N,)
+    - targets: The targets, shape (2,) or (N, 2)
+
+    Returns:
+    - The solved joint angles, shape (N, num_links)
+    - The final distance of each configuration to its target, shape (N,)
+    - The number of iterations used
+    """
+    n = joints.shape[0]
+    joints = np.array(joints, dtype=np.float64)
+    bases = np.broadcast_to(np.asarray(bases, dtype=np.float64), (n, 2))
+    lengths = np.broadcast_to(np.asarray(lengths, dtype=np.float64), (n,))
+    targets = np.broadcast_to(np.asarray(targets, dtype=np.float64), (n, 2))
+    damping = np.full(n, damping, dtype=np.float64)
+    eye = np.eye(2)
+
+    ends, links = batch_forward_kinematics(bases, lengths, joints, return_links=True)
+    errors = targets - ends
+    residuals = np.linalg.norm(errors, axis=1)
+    active = residuals > tolerance
+
+    iterations = 0
+    while active.any() and iterations < max_iterations:
+        iterations += 1
+
+        # Δθ = Jᵀ (J Jᵀ + λ² I)⁻¹ e, for every active configuration
+        idx = np.flatnonzero(active)
+        jacobian = batch_jacobian(ends[idx], links[idx])
+        jacobian_t = jacobian.transpose(0, 2, 1)
+        lhs = jacobian @ jacobian_t + damping[idx, np.newaxis, np.newaxis] ** 2 * eye
+        steps = (jacobian_t @ np.linalg.solve(lhs, errors[idx, :, np.newaxis]))[..., 0]
+
+        # Try the steps
+        new_joints = joints[idx] + steps
+        new_ends, new_links = batch_forward_kinematics(bases[idx], lengths[idx], new_joints, return_links=True)
+        new_errors = targets[idx] - new_ends
+        new_residuals = np.linalg.norm(new_errors, axis=1)
+
+        # Accept the configurations that improved
+        better = new_residuals < residuals[idx]
+        accepted = idx[better]
+        joints[accepted] = new_joints[better]
+        ends[accepted] = new_ends[better]
+        links[accepted] = new_links[better]
+        errors[accepted] = new_errors[better]
+        residuals[accepted] = new_residuals[better]
+
+        # Adapt the damping of each configuration
+        damping[idx] *= np.where(better, damping_down, damping_up)
+        np.maximum(damping, 1e-9, out=damping)
+
+        active = (residuals > tolerance) & (damping <= max_damping)
+
+    return joints, residuals, iterations
+
+
+class BatchDLSController(Controller):
+    def __init__(
+            self,
+            damping: float = 1.0,
+            tolerance: float = 1.0,
+            max_iterations: int = 50,
+            damping_up: float = 10.0,
+            damping_down: float = 0.5,
+            max_damping: float = 1e6,
+    ) -> None:
+        """
+        Create a new batched DLS controller
+
+        Args:
+        - damping: The initial damping factor λ of each arm
+        - tolerance: An arm stops once its end effector is this close to its target
+        - max_iterations: The maximum number of iterations per update
+        - damping_up: Multiply λ by this after a rejected step
+        - damping_down: Multiply λ by this after an accepted step
+        - max_damping: An arm gives up (diverging) once its λ exceeds this
+        """
+        self.damping = damping
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.damping_up = damping_up
+        self.damping_down = damping_down
+        self.max_damping = max_damping
+
+        # Stats of the last update
+        self.iterations = 0
+        self.residuals = np.zeros(0)
+
+    def update(self, arm: Any, target: np.ndarray) -> None:
+        """
+        Update a single arm towards a target
+
+        Args:
+        - arm: The arm to update
+        - target: The target to update to
+        """
+        self.update_all([arm], np.asarray(target, dtype=np.float64)[np.newaxis])
+
+    def update_all(self, arms: Sequence[Any], targets: np.ndarray) -> None:
+        """
+        Update every arm towards its target
+
+        Arms with the same number of links are stacked and
+        stepped together, so the Python overhead is per group
+        rather than per arm
+
+        Args:
+        - arms: The arms to update
+        - targets: The target of each arm, shape (len(arms), 2)
+        """
+        targets = np.asarray(targets, dtype=np.float64)
+        if targets.shape != (len(arms), 2):
+            raise ValueError("targets must have shape (len(arms), 2)")
+
+        groups = defaultdict(list)
+        for i, arm in enumerate(arms):
+            groups[arm.num_links].append(i)
+
+        self.iterations = 0
+        self.residuals = np.zeros(len(arms))
+
+        for indices in groups.values():
+            group = [arms[i] for i in indices]
+            self.residuals[indices] = self.__solve(group, targets[indices])
+
+    def __solve(self, arms: List[Any], targets: np.ndarray) -> np.ndarray:
+        """
+        Solve a group of arms with the same number of links
+
+        Returns:
+        - The final distance of each arm to its target
+        """
+        joints, residuals, iterations = batch_dls(
+            np.stack([arm.joints for arm in arms]),
+            np.stack([arm.pos for arm in arms]),
+            np.array([arm.link_length for arm in arms]),
+            targets,
+            damping=self.damping,
+            tolerance=self.tolerance,
+            max_iterations=self.max_iterations,
+            damping_up=self.damping_up,
+            damping_down=self.damping_down,
+            max_damping=self.max_damping,
+        )
+
+        self.iterations = max(self.iterations, iterations)
+
+        # Write the results back into each arm
+        for arm, row in zip(arms, joints):
+            arm.set_joints(row)
+
+        return residuals
@@ -0,0 +1,303 @@
+from __future__ import annotations
+from typing import *
+from collections import OrderedDict
+import numpy as np
+import constants as const
+from arm.controllers.base import Controller
+
+"""
+Warm-start cache of converged IK solutions
+"""
+
+class SolutionCache:
+    def __init__(self, maxsize: int = 1024, quantum: float = 2.0) -> None:
+        """
+        Create a new solution cache
+
+        Args:
+        - maxsize: The maximum number of solutions kept, least recently used are evicted
+        - quantum: The size of the grid targets and base positions are snapped to
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if quantum <= 0:
+            raise ValueError("quantum must be positive")
+
+        self.maxsize = maxsize
+        self.quantum = quantum
+
+        # key -> (target, joints)
+        self.__entries: OrderedDict[Hashable, Tuple[np.ndarray, np.ndarray]] = OrderedDict()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.seeds = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The fraction of lookups that were hits
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def arm_key(self, arm: Any) -> Tuple:
+        """
+        Get the part of the key describing the arm's configuration
+
+        Args:
+        - arm: The arm
+
+        Returns:
+        - The quantized base position, link length and number of links
+        """
+        base = tuple(np.floor(arm.pos / self.quantum).astype(int))
+        return (base, float(arm.link_length), arm.num_links)
+
+    def key(self, arm: Any, target: np.ndarray) -> Tuple:
+        """
+        Get the cache key of an arm reaching for a target
+
+        Args:
+        - arm: The arm
+        - target: The target
+
+        Returns:
+        - The key
+        """
+        cell = tuple(np.floor(np.asarray(target) / self.quantum).astype(int))
+        return (self.arm_key(arm), cell)
+
+    def get(self, arm: Any, target: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Look up the solution for an arm reaching for a target
+
+        Args:
+        - arm: The arm
+        - target: The target
+
+        Returns:
+        - The cached joint angles, or None on a miss
+        """
+        key = self.key(arm, target)
+        entry = self.__entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.__entries.move_to_end(key)
+        return entry[1].copy()
+
+    def nearest(self, arm: Any, target: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Find the cached solution of this arm whose target is
+        closest to the given target
+
+        Args:
+        - arm: The arm
+        - target: The target
+
+        Returns:
+        - The joint angles, or None if nothing is cached for this arm
+        """
+        arm_key = self.arm_key(arm)
+        candidates = [entry for key, entry in self.__entries.items() if key[0] == arm_key]
+        if not candidates:
+            return None
+
+        targets = np.array([entry[0] for entry in candidates])
+        best = np.argmin(np.sum((targets - target) ** 2, axis=1))
+
+        self.seeds += 1
+        return candidates[best][1].copy()
+
+    def put(self, arm: Any, target: np.ndarray, joints: np.ndarray) -> None:
+        """
+        Store a converged solution
+
+        Args:
+        - arm: The arm
+        - target: The target that was reached
+        - joints: The joint angles reaching it
+        """
+        key = self.key(arm, target)
+        self.__entries[key] = (np.array(target, dtype=np.float64), np.array(joints, dtype=np.float64))
+        self.__entries.move_to_end(key)
+
+        while len(self.__entries) > self.maxsize:
+            self.__entries.popitem(last=False)
+
+    def get_state(self, width: int) -> np.ndarray:
+        """
+        Get every solution, least recently used first, for snapshots
+
+        Each of the maxsize slots is the number of links (0 for an
+        empty slot), the quantized base, the link length, the target
+        and the joints padded to width
+
+        Args:
+        - width: The most links of any arm, the length of the joints in each slot
+
+        Returns:
+        - The state, shape (maxsize * (6 + width),)
+        """
+        state = np.zeros((self.maxsize, 6 + width), dtype=np.float64)
+
+        for slot, (key, (target, joints)) in enumerate(self.__entries.items()):
+            (base, link_length, num_links), _ = key
+            if num_links > width:
+                raise ValueError(f"cache holds a solution with more than {width} links")
+
+            state[slot, :6] = (num_links, *base, link_length, *target)
+            state[slot, 6:6 + num_links] = joints
+
+        return state.ravel()
+
+    def set_state(self, width: int, state: np.ndarray) -> None:
+        """
+        Replace every solution with those from get_state, keeping the stats
+
+        Args:
+        - width: The width the state was taken with
+        - state: The state
+        """
+        self.__entries.clear()
+
+        for row in state.reshape(self.maxsize, 6 + width):
+            num_links = int(row[0])
+            if num_links == 0:
+                continue
+
+            target = row[4:6].copy()
+            arm_key = ((int(row[1]), int(row[2])), float(row[3]), num_links)
+            cell = tuple(np.floor(target / self.quantum).astype(int))
+            self.__entries[(arm_key, cell)] = (target, row[6:6 + num_links].copy())
+
+    def clear(self) -> None:
+        """
+        Remove every solution and reset the stats
+        """
+        self.__entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.seeds = 0
+
+
+class CachedController(Controller):
+    # Length of each arm's part of the state (see get_state)
+    ARM_STATE_SIZE = 4
+
+    def __init__(
+            self,
+            controller: Controller,
+            cache: Optional[SolutionCache] = None,
+            tolerance: float = const.ARM_END_RADIUS + 10,
+    ) -> None:
+        """
+        Wrap a controller so it warm-starts from cached solutions
+
+        Args:
+        - controller: The controller doing the solving
+        - cache: The cache to use, can be shared between controllers
+        - tolerance: Only solutions this close to their target are
+          cached, by default as close as the tasks get before moving on
+        """
+        self.controller = controller
+        self.cache = cache if cache is not None else SolutionCache()
+        self.tolerance = tolerance
+
+        # arm -> (its current target, if its solution is cached yet)
+        self.__targets: Dict[Any, Tuple[np.ndarray, bool]] = {}
+
+    def get_state(self, arms: Sequence[Any]) -> np.ndarray:
+        # The whole cache, so snapshots grow with its maxsize
+        width = max((arm.num_links for arm in arms), default=0)
+        targets = np.zeros((len(arms), CachedController.ARM_STATE_SIZE), dtype=np.float64)
+        for row, arm in zip(targets, arms):
+            if arm in self.__targets:
+                target, stored = self.__targets[arm]
+                row[:] = (1, *target, stored)
+
+        return np.concatenate([
+            self.controller.get_state(arms),
+            targets.ravel(),
+            self.cache.get_state(width),
+        ])
+
+    def set_state(self, arms: Sequence[Any], state: np.ndarray) -> None:
+        width = max((arm.num_links for arm in arms), default=0)
+        size = len(self.controller.get_state(arms))
+        self.controller.set_state(arms, state[:size])
+
+        end = size + len(arms) * CachedController.ARM_STATE_SIZE
+        targets = state[size:end].reshape(len(arms), CachedController.ARM_STATE_SIZE)
+        self.__targets = {
+            arm: (row[1:3].copy(), bool(row[3]))
+            for arm, row in zip(arms, targets) if row[0]
+        }
+
+        self.cache.set_state(width, state[end:])
+
+    def update(self, arm: Any, target: np.ndarray) -> None:
+        """
+        Update the arm towards a target. When the target changes,
+        the pose reached for the last one is cached and the arm
+        starts from a cached solution if it is closer than the
+        current pose, so the cache is only searched once per target
+
+        Args:
+        - arm: The arm to update
+        - target: The target to update to
+        """
+        target = np.array(target, dtype=np.float64)
+        last, stored = self.__targets.get(arm, (None, False))
+
+        if last is None or self.cache.key(arm, last) != self.cache.key(arm, target):
+            # The task reaching for the last target is done with it
+            if last is not None and not stored:
+                self.__remember(arm, last)
+
+            stored = False
+            residual = np.linalg.norm(target - arm.get_end_effector_pos())
+            if residual > self.tolerance:
+                seed = self.cache.get(arm, target)
+                if seed is None:
+                    seed = self.cache.nearest(arm, target)
+
+                if seed is not None:
+                    self.__seed(arm, target, seed, residual)
+
+        self.controller.update(arm, target)
+
+        # Controllers which can tell are done with the target once they converge
+        if not stored and getattr(self.controller, "converged", False):
+            stored = self.__remember(arm, target)
+
+        self.__targets[arm] = (target, stored)
+
+    def __remember(self, arm: Any, target: np.ndarray) -> bool:
+        """
+        Cache the arm's pose as the solution of a target, if it's close enough
+
+        Returns:
+        - If it was cached
+        """
+        if np.linalg.norm(target - arm.get_end_effector_pos()) > self.tolerance:
+            return False
+
+        self.cache.put(arm, target, arm.joints)
+        return True
+
+    def __seed(self, arm: Any, target: np.ndarray, seed: np.ndarray, residual: float) -> None:
+        """
+        Move the arm to the seed if it's closer to the target
+        """
+        seed_end = arm.forward_kinematics(seed[np.newaxis])[0]
+        if np.linalg.norm(target - seed_end) < residual:
+            arm.set_joints(seed)
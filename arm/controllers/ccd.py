@@ -0,0 +1,90 @@
+from __future__ import annotations
+from typing import *
+import math
+import numpy as np
+from arm.controllers.base import Controller
+
+"""
+The Cyclic Coordinate Descent (CCD) controller
+"""
+
+class CCDController(Controller):
+    """
+    Rotating a joint never changes how far the end effector is from
+    it, so CCD can only uncurl an arm slowly, over many sweeps. Long
+    arms starting curled up (like the default pose) fall short of
+    targets far from the base: from the default pose, 200 links solve
+    none of the benchmark's far targets in 100 updates. Damping or
+    weighting each joint's rotation by its distance to the end
+    effector doesn't help. Wrap it in a ReachController, whose seeds
+    are stretched out, to solve long arms.
+    """
+    def __init__(self, tolerance: float = 1.0, max_sweeps: int = 10, max_angle: float = np.pi) -> None:
+        """
+        Create a new CCD controller
+
+        Args:
+        - tolerance: Stop once the end effector is this close to the target
+        - max_sweeps: The maximum number of sweeps over every joint per update
+        - max_angle: The largest rotation of a single joint per step
+        """
+        self.tolerance = tolerance
+        self.max_sweeps = max_sweeps
+        self.max_angle = max_angle
+
+        # Stats of the last update
+        self.iterations = 0
+        self.residual = np.inf
+        self.converged = False
+
+    def update(self, arm: Any, target: np.ndarray) -> None:
+        """
+        Update the arm towards a target by rotating one joint at a
+        time, from the end effector back to the base, so the end
+        effector points at the target
+
+        Args:
+        - arm: The arm to update
+        - target: The target to update to
+        """
+        tx, ty = float(target[0]), float(target[1])
+
+        end = arm.get_end_effector_pos()
+        ex, ey = float(end[0]), float(end[1])
+
+        residual = math.hypot(ex - tx, ey - ty)
+        self.iterations = 0
+
+        while residual > self.tolerance and self.iterations < self.max_sweeps:
+            self.iterations += 1
+
+            # Rotating joint i only moves the links after it, so the
+            # start of link i is unaffected by the joints already
+            # visited this sweep and only the end effector needs
+            # to be tracked
+            links = arm.links.tolist()
+            joints = arm.joints.tolist()
+
+            for i in range(arm.num_links - 1, -1, -1):
+                px, py = links[i]
+                rx, ry = ex - px, ey - py
+
+                # Angle from the end effector to the target around joint i
+                delta = math.atan2(ty - py, tx - px) - math.atan2(ry, rx)
+                delta = (delta + math.pi) % (2 * math.pi) - math.pi
+                delta = max(-self.max_angle, min(delta, self.max_angle))
+
+                joints[i] += delta
+
+                c, s = math.cos(delta), math.sin(delta)
+                ex = px + c * rx - s * ry
+                ey = py + s * rx + c * ry
+
+            arm.set_joints(np.array(joints))
+
+            end = arm.get_end_effector_pos()
+            ex, ey = float(end[0]), float(end[1])
+            residual = math.hypot(ex - tx, ey - ty)
+
+        self.residual = residual
+        self.converged = residual <= self.tolerance
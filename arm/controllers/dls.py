@@ -0,0 +1,113 @@
+from __future__ import annotations
+from typing import *
+import numpy as np
+from arm.controllers.base import Controller
+from arm.controllers.jacobian import compute_jacobian
+
+"""
+The Damped Least Squares (Levenberg-Marquardt) controller
+"""
+
+class DLSController(Controller):
+    def __init__(
+            self,
+            damping: float = 1.0,
+            tolerance: float = 1.0,
+            step_tolerance: float = 1e-6,
+            max_iterations: int = 50,
+            damping_up: float = 10.0,
+            damping_down: float = 0.5,
+            max_damping: float = 1e6,
+    ) -> None:
+        """
+        Create a new DLS controller
+
+        Args:
+        - damping: The initial damping factor λ
+        - tolerance: Stop once the end effector is this close to the target
+        - step_tolerance: Stop once the joint step, or the relative
+          improvement of a step, is smaller than this
+        - max_iterations: The maximum number of iterations per update
+        - damping_up: Multiply λ by this after a rejected step
+        - damping_down: Multiply λ by this after an accepted step
+        - max_damping: Give up (diverging) once λ exceeds this
+        """
+        self.initial_damping = damping
+        self.damping = damping
+        self.tolerance = tolerance
+        self.step_tolerance = step_tolerance
+        self.max_iterations = max_iterations
+        self.damping_up = damping_up
+        self.damping_down = damping_down
+        self.max_damping = max_damping
+
+        # Stats of the last update
+        self.iterations = 0
+        self.residual = np.inf
+        self.converged = False
+
+    def get_state(self, arms: Sequence[Any]) -> np.ndarray:
+        # λ carries over from one update to the next
+        return np.array([self.damping], dtype=np.float64)
+
+    def set_state(self, arms: Sequence[Any], state: np.ndarray) -> None:
+        self.damping = float(state[0])
+
+    def update(self, arm: Any, target: np.ndarray) -> None:
+        """
+        Update the arm towards a target, stopping as soon as the
+        target is reached or no more progress can be made
+
+        The number of iterations used, the final distance to the
+        target and whether it was reached are stored in
+        self.iterations, self.residual and self.converged
+
+        Args:
+        - arm: The arm to update
+        - target: The target to update to
+        """
+        error = target - arm.get_end_effector_pos()
+        residual = np.linalg.norm(error)
+
+        self.iterations = 0
+        self.converged = residual <= self.tolerance
+
+        while not self.converged and self.iterations < self.max_iterations:
+            self.iterations += 1
+
+            # Δθ = Jᵀ (J Jᵀ + λ² I)⁻¹ e
+            jacobian = compute_jacobian(arm)
+            lhs = jacobian @ jacobian.T + self.damping ** 2 * np.eye(2)
+            step = jacobian.T @ np.linalg.solve(lhs, error)
+
+            if np.linalg.norm(step) < self.step_tolerance:
+                break
+
+            # Try the step without moving the arm
+            new_joints = arm.joints + step
+            new_end = arm.forward_kinematics(new_joints[np.newaxis])[0]
+            new_error = target - new_end
+            new_residual = np.linalg.norm(new_error)
+
+            if new_residual < residual:
+                # Stalled, e.g. reaching for an unreachable target
+                stalled = residual - new_residual < self.step_tolerance * residual
+
+                # Accept and trust the linear model more
+                arm.set_joints(new_joints)
+                error = new_error
+                residual = new_residual
+                self.damping = max(self.damping * self.damping_down, 1e-9)
+                self.converged = residual <= self.tolerance
+
+                if stalled:
+                    break
+            else:
+                # Reject and trust the linear model less
+                self.damping *= self.damping_up
+                if self.damping > self.max_damping:
+                    # Diverging, reset for the next target
+                    self.damping = self.initial_damping
+                    break
+
+        self.residual = residual
@@ -0,0 +1,129 @@
+from __future__ import annotations
+from typing import *
+import math
+import numpy as np
+from arm.controllers.base import Controller
+
+"""
+The Forward And Backward Reaching Inverse Kinematics (FABRIK) controller
+"""
+
+class FABRIKController(Controller):
+    def __init__(self, tolerance: float = 1.0, max_sweeps: int = 10) -> None:
+        """
+        Create a new FABRIK controller
+
+        Args:
+        - tolerance: Stop once the end effector is this close to the target
+        - max_sweeps: The maximum number of forward and backward sweeps per update
+        """
+        self.tolerance = tolerance
+        self.max_sweeps = max_sweeps
+
+        # Stats of the last update
+        self.iterations = 0
+        self.residual = np.inf
+        self.converged = False
+
+    def update(self, arm: Any, target: np.ndarray) -> None:
+        """
+        Update the arm towards a target by moving the link positions
+        directly, then recovering the joint angles from them
+
+        Args:
+        - arm: The arm to update
+        - target: The target to update to
+        """
+        n = arm.num_links
+        length = arm.link_length
+        tx, ty = float(target[0]), float(target[1])
+        bx, by = float(arm.pos[0]), float(arm.pos[1])
+
+        # Joint positions including the end effector
+        # Plain floats are much faster than numpy for these scalar sweeps
+        end = arm.get_end_effector_pos()
+        xs = arm.links[:, 0].tolist() + [float(end[0])]
+        ys = arm.links[:, 1].tolist() + [float(end[1])]
+
+        residual = math.hypot(xs[n] - tx, ys[n] - ty)
+        self.iterations = 0
+        self.converged = residual <= self.tolerance
+        if self.converged:
+            self.residual = residual
+            return
+
+        reach = math.hypot(tx - bx, ty - by)
+        if reach >= n * length:
+            # Unreachable, stretch straight towards the target
+            xs, ys = self.__straighten(n, length, bx, by, tx, ty, reach)
+            self.iterations = 1
+            residual = reach - n * length
+        else:
+            while residual > self.tolerance and self.iterations < self.max_sweeps:
+                self.iterations += 1
+
+                # Forward: pin the end effector to the target
+                xs[n], ys[n] = tx, ty
+                for i in range(n - 1, -1, -1):
+                    self.__place(xs, ys, i, i + 1, length)
+
+                # Backward: pin the first joint back to the base
+                xs[0], ys[0] = bx, by
+                for i in range(n):
+                    self.__place(xs, ys, i + 1, i, length)
+
+                residual = math.hypot(xs[n] - tx, ys[n] - ty)
+
+        self.residual = residual
+        self.converged = residual <= self.tolerance
+
+        set_joints_from_positions(arm, np.array(xs), np.array(ys))
+
+    @staticmethod
+    def __place(xs: List[float], ys: List[float], i: int, anchor: int, length: float) -> None:
+        """
+        Move point i onto the line towards its current position,
+        exactly one link length away from the anchor point
+        """
+        dx = xs[i] - xs[anchor]
+        dy = ys[i] - ys[anchor]
+        d = math.hypot(dx, dy)
+
+        # dont divide by 0
+        if d == 0:
+            dx, dy, d = length, 0.0, length
+
+        s = length / d
+        xs[i] = xs[anchor] + dx * s
+        ys[i] = ys[anchor] + dy * s
+
+    @staticmethod
+    def __straighten(n: int, length: float, bx: float, by: float, tx: float, ty: float, reach: float) -> Tuple[List[float], List[float]]:
+        """
+        Lay every link along the line from the base to the target
+        """
+        ux = (tx - bx) / reach if reach > 0 else 1.0
+        uy = (ty - by) / reach if reach > 0 else 0.0
+        steps = np.arange(n + 1) * length
+
+        return (bx + ux * steps).tolist(), (by + uy * steps).tolist()
+
+
+def set_joints_from_positions(arm: Any, xs: np.ndarray, ys: np.ndarray) -> None:
+    """
+    Set the arm's joint angles so its links pass through the
+    given joint positions
+
+    Args:
+    - arm: The arm
+    - xs: The x coordinates of the joints and end effector, shape (num_links + 1,)
+    - ys: The y coordinates of the joints and end effector, shape (num_links + 1,)
+    """
+    # Absolute angle of each link, then relative to the previous link
+    angles = np.arctan2(np.diff(ys), np.diff(xs))
+    relative = np.diff(angles, prepend=0.0)
+
+    # Wrap into [-π, π)
+    relative = (relative + np.pi) % (2 * np.pi) - np.pi
+
+    arm.set_joints(relative)
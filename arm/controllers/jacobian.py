@@ -0,0 +1,86 @@
+from __future__ import annotations
+from typing import *
+import numpy as np
+from arm.controllers.base import Controller
+
+"""
+The analytic Jacobian controller
+"""
+
+def compute_jacobian(arm: Any) -> np.ndarray:
+    """
+    Compute the Jacobian of the end effector position
+    with respect to the joint angles
+
+    Rotating joint i swings everything after the start of
+    link i around that point, so its column is the vector
+    from the start of link i to the end effector, rotated
+    by 90 degrees:
+        ∂e/∂θ_i = [-(e_y - p_iy), e_x - p_ix]
+
+    Args:
+    - arm: The arm
+
+    Returns:
+    - The Jacobian, shape (2, num_links)
+    """
+    r = arm.get_end_effector_pos() - arm.links
+
+    jacobian = np.empty((2, arm.num_links), dtype=np.float64)
+    jacobian[0] = -r[:, 1]
+    jacobian[1] = r[:, 0]
+
+    return jacobian
+
+
+class JacobianController(Controller):
+    # Supported update methods
+    METHODS = ("transpose", "pinv")
+
+    def __init__(self, alpha: float = 0.5, epochs: int = 10, method: str = "transpose") -> None:
+        """
+        Create a new Jacobian controller
+
+        Args:
+        - alpha: The step size, as a fraction of the full step
+        - epochs: The number of epochs
+        - method: "transpose" for the Jacobian-transpose step or
+          "pinv" for the pseudo-inverse step
+        """
+        if method not in JacobianController.METHODS:
+            raise ValueError(f"method must be one of {JacobianController.METHODS}")
+
+        self.alpha = alpha
+        self.epochs = epochs
+        self.method = method
+
+    def update(self, arm: Any, target: np.ndarray) -> None:
+        """
+        Update the arm towards a target using the Jacobian
+
+        Args:
+        - arm: The arm to update
+        - target: The target to update to
+        """
+        for _ in range(self.epochs):
+            self.__update(arm, target)
+
+    def __update(self, arm: Any, target: np.ndarray) -> None:
+        error = target - arm.get_end_effector_pos()
+        jacobian = compute_jacobian(arm)
+
+        if self.method == "pinv":
+            step = np.linalg.pinv(jacobian) @ error
+        else:
+            # Scale the transpose step so it would land on the
+            # target if the arm were linear:
+            #   α = <e, J Jᵀ e> / <J Jᵀ e, J Jᵀ e>
+            step = jacobian.T @ error
+            moved = jacobian @ step
+            denom = np.dot(moved, moved)
+            if denom == 0:
+                return
+            step *= np.dot(error, moved) / denom
+
+        # Update the joint angles
+        arm.set_joints(arm.joints + self.alpha * step)
@@ -0,0 +1,181 @@
+from __future__ import annotations
+from typing import *
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from arm.arm import Arm
+from arm.controllers.base import Controller
+from arm.controllers.batch import batch_dls
+
+"""
+Multi-start controller which refines many random seeds and keeps the best
+"""
+
+def refine_seeds(
+        seeds: np.ndarray,
+        base: np.ndarray,
+        link_length: float,
+        target: np.ndarray,
+        tolerance: float,
+        max_iterations: int,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Refine a block of seeds towards a target
+    Module level so it can be sent to a process pool
+
+    Args:
+    - seeds: The starting joint angles, shape (K, num_links)
+    - base: The base position of the arm
+    - link_length: The length of each link
+    - target: The target
+    - tolerance: The distance at which a seed counts as solved
+    - max_iterations: The maximum number of iterations
+
+    Returns:
+    - The refined joint angles, shape (K, num_links)
+    - The final distance of each to the target, shape (K,)
+    - The number of iterations used
+    """
+    return batch_dls(
+        seeds,
+        base,
+        link_length,
+        target,
+        tolerance=tolerance,
+        max_iterations=max_iterations,
+    )
+
+
+def _split_uint128(value: int) -> List[int]:
+    """
+    Split a 128-bit integer into 32-bit words, which
+    a float64 array holds exactly
+    """
+    return [(value >> shift) & 0xFFFFFFFF for shift in (96, 64, 32, 0)]
+
+
+def _join_uint128(words: np.ndarray) -> int:
+    """
+    Join the words from _split_uint128 back into an integer
+    """
+    value = 0
+    for word in words:
+        value = (value << 32) | int(word)
+    return value
+
+
+class MultiStartController(Controller):
+    def __init__(
+            self,
+            num_starts: int = 16,
+            seed: Optional[int] = None,
+            tolerance: float = 1.0,
+            max_iterations: int = 50,
+            workers: Optional[int] = None,
+            pool_threshold: int = 1024,
+    ) -> None:
+        """
+        Create a new multi-start controller
+
+        Args:
+        - num_starts: The number of seeds refined per update, including the current pose
+        - seed: The random seed, fixed seeds give reproducible solutions
+        - tolerance: The distance at which a seed counts as solved
+        - max_iterations: The maximum number of iterations per seed
+        - workers: The number of processes to fan out to, None to stay in this process
+        - pool_threshold: Only fan out when there are at least this many seeds
+        """
+        if num_starts < 1:
+            raise ValueError("num_starts must be at least 1")
+
+        self.num_starts = num_starts
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.workers = workers
+        self.pool_threshold = pool_threshold
+
+        self.rng = np.random.default_rng(seed)
+        self.__pool = None
+
+        # Stats of the last update
+        self.iterations = 0
+        self.residual = np.inf
+        self.best_start = 0
+
+    def get_state(self, arms: Sequence[Any]) -> np.ndarray:
+        # The random seeds differ every update, so carry the PCG64 state
+        state = self.rng.bit_generator.state
+        return np.array([
+            *_split_uint128(state["state"]["state"]),
+            *_split_uint128(state["state"]["inc"]),
+            state["has_uint32"],
+            state["uinteger"],
+        ], dtype=np.float64)
+
+    def set_state(self, arms: Sequence[Any], state: np.ndarray) -> None:
+        self.rng.bit_generator.state = {
+            "bit_generator": "PCG64",
+            "state": {
+                "state": _join_uint128(state[0:4]),
+                "inc": _join_uint128(state[4:8]),
+            },
+            "has_uint32": int(state[8]),
+            "uinteger": int(state[9]),
+        }
+
+    def update(self, arm: Any, target: np.ndarray) -> None:
+        """
+        Update the arm to the best solution found from several seeds
+
+        The seeds are refined in lockstep, so the number of iterations
+        stored in self.iterations is that of the slowest seed
+
+        Args:
+        - arm: The arm to update
+        - target: The target to update to
+        """
+        target = np.asarray(target, dtype=np.float64)
+
+        # The current pose is always tried first, the rest are random
+        seeds = np.empty((self.num_starts, arm.num_links), dtype=np.float64)
+        seeds[0] = arm.joints
+        seeds[1:] = self.rng.uniform(Arm.ROT_START, Arm.ROT_END, (self.num_starts - 1, arm.num_links))
+
+        joints, residuals, self.iterations = self.__refine(seeds, arm, target)
+
+        # Prefer the first solved seed, so the arm stays put when its
+        # current pose already works, otherwise the closest one
+        # Both take the first of any ties, so this is deterministic
+        solved = np.flatnonzero(residuals <= self.tolerance)
+        self.best_start = int(solved[0]) if len(solved) else int(np.argmin(residuals))
+        self.residual = float(residuals[self.best_start])
+
+        arm.set_joints(joints[self.best_start])
+
+    def __refine(self, seeds: np.ndarray, arm: Any, target: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Refine the seeds, in a process pool if there are enough of them
+        """
+        args = (arm.pos, arm.link_length, target, self.tolerance, self.max_iterations)
+
+        if self.workers is None or len(seeds) < self.pool_threshold:
+            return refine_seeds(seeds, *args)
+
+        if self.__pool is None:
+            self.__pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        # map keeps the chunk order, so results don't depend on scheduling
+        chunks = np.array_split(seeds, self.workers)
+        results = list(self.__pool.map(refine_seeds, chunks, *[[arg] * len(chunks) for arg in args]))
+
+        joints = np.concatenate([result[0] for result in results])
+        residuals = np.concatenate([result[1] for result in results])
+        iterations = max(result[2] for result in results)
+        return joints, residuals, iterations
+
+    def close(self) -> None:
+        """
+        Shut down the process pool, if one was started
+        """
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
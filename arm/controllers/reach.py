@@ -0,0 +1,76 @@
+from __future__ import annotations
+from typing import *
+import numpy as np
+from arm.controllers.base import Controller
+from arm.workspace import WorkspaceMap
+
+"""
+Controller wrapper which consults the arm's workspace map
+"""
+
+class ReachController(Controller):
+    def __init__(self, controller: Controller, **kwargs: Any) -> None:
+        """
+        Wrap a controller so it skips unreachable targets and
+        warm-starts reachable ones from the workspace map
+
+        Args:
+        - controller: The controller doing the solving
+        - kwargs: Passed to WorkspaceMap.for_arm
+        """
+        self.controller = controller
+        self.kwargs = kwargs
+
+        # If the last target was reachable
+        self.reachable = True
+
+        # Maps already looked up, by link length and number of links
+        self.maps: Dict[Tuple[float, int], WorkspaceMap] = {}
+
+    def workspace(self, arm: Any) -> WorkspaceMap:
+        """
+        Get the workspace map of an arm
+        """
+        key = (arm.link_length, arm.num_links)
+        if key not in self.maps:
+            self.maps[key] = WorkspaceMap.for_arm(arm, **self.kwargs)
+        return self.maps[key]
+
+    def get_state(self, arms: Sequence[Any]) -> np.ndarray:
+        # The maps only depend on the arms, so only the wrapped controller has state
+        return self.controller.get_state(arms)
+
+    def set_state(self, arms: Sequence[Any], state: np.ndarray) -> None:
+        self.controller.set_state(arms, state)
+
+    def is_reachable(self, arm: Any, target: np.ndarray) -> bool:
+        """
+        Check if the arm can reach a target
+        """
+        return self.workspace(arm).is_reachable(arm, target)
+
+    def update(self, arm: Any, target: np.ndarray) -> None:
+        """
+        Update the arm towards a target, doing nothing if
+        the target is out of reach
+
+        Args:
+        - arm: The arm to update
+        - target: The target to update to
+        """
+        workspace = self.workspace(arm)
+
+        self.reachable = workspace.is_reachable(arm, target)
+        if not self.reachable:
+            return
+
+        # Jump to the map's seed if it is closer than the current pose
+        seed = workspace.get_seed(arm, target)
+        if seed is not None:
+            residual = np.linalg.norm(target - arm.get_end_effector_pos())
+            seed_end = arm.forward_kinematics(seed[np.newaxis])[0]
+
+            if np.linalg.norm(target - seed_end) < residual:
+                arm.set_joints(seed)
+
+        self.controller.update(arm, target)
@@ -0,0 +1,346 @@
+from __future__ import annotations
+from typing import *
+import hashlib
+import os
+import numpy as np
+from arm.arm import batch_forward_kinematics
+
+"""
+Precomputed workspace map of an arm configuration
+
+Which targets the end effector can reach is worked out from the
+link lengths and joint limits: the end effector's distance from
+the base never depends on the first joint, so the workspace is an
+annulus around the base. The map is a grid centred on the base
+which stores, for every cell, whether it touches that annulus and
+a joint configuration that ends up close to the cell's centre. It only
+depends on the link length, number of links and joint limits,
+so one map serves every arm with that configuration, wherever
+its base is, and is cached to disk between runs.
+"""
+
+# Default directory maps are cached in
+CACHE_DIR = ".workspace_cache"
+
+# Maps already loaded in this process
+_MAPS: Dict[Tuple, WorkspaceMap] = {}
+
+
+class WorkspaceMap:
+    def __init__(
+            self,
+            link_length: float,
+            num_links: int,
+            rot_start: float = -np.pi,
+            rot_end: float = np.pi,
+            resolution: int = 64,
+            samples: int = 200_000,
+            seed: int = 0,
+            build: bool = True,
+    ) -> None:
+        """
+        Create a new workspace map
+
+        The arm doesn't clamp its joints to Arm.ROT_START and
+        Arm.ROT_END, so by default the map covers the unlimited
+        workspace. Pass tighter limits to model a constrained arm.
+
+        Args:
+        - link_length: The length of each link
+        - num_links: The number of links
+        - rot_start: The lower joint limit
+        - rot_end: The upper joint limit
+        - resolution: The number of cells along each side of the grid
+        - samples: The number of random configurations sampled
+        - seed: The random seed of the sampling
+        - build: Whether to sample the map now
+        """
+        self.link_length = float(link_length)
+        self.num_links = num_links
+        self.rot_start = float(rot_start)
+        self.rot_end = float(rot_end)
+        self.resolution = resolution
+        self.samples = samples
+        self.seed = seed
+
+        # The grid spans the full reach of the arm in each direction
+        self.radius = self.link_length * num_links
+        self.cell_size = 2 * self.radius / resolution
+
+        # The annulus the end effector is confined to (see build)
+        self.min_reach = 0.0 if num_links > 1 else self.link_length
+        self.max_reach = self.radius
+
+        self.reachable = np.zeros((resolution, resolution), dtype=bool)
+        self.has_seed = np.zeros((resolution, resolution), dtype=bool)
+        self.seeds = np.zeros((resolution, resolution, num_links), dtype=np.float64)
+
+        if build:
+            self.build()
+
+    @property
+    def key(self) -> Tuple:
+        """
+        Everything the contents of the map depend on
+        """
+        return WorkspaceMap.make_key(
+            self.link_length,
+            self.num_links,
+            self.rot_start,
+            self.rot_end,
+            self.resolution,
+            self.samples,
+            self.seed,
+        )
+
+    @staticmethod
+    def make_key(
+            link_length: float,
+            num_links: int,
+            rot_start: float = -np.pi,
+            rot_end: float = np.pi,
+            resolution: int = 64,
+            samples: int = 200_000,
+            seed: int = 0,
+    ) -> Tuple:
+        """
+        Get the key of a map from its arguments, without building
+        or allocating it. The arguments are those of WorkspaceMap
+
+        Returns:
+        - The key, equal to the map's key property
+        """
+        return (float(link_length), num_links, float(rot_start), float(rot_end), resolution, samples, seed)
+
+    def build(self, chunk_size: int = 1 << 18) -> None:
+        """
+        Work out the reachable annulus, then sample random
+        configurations and bin their end effectors for the seeds
+
+        Args:
+        - chunk_size: The number of joint values evaluated at once,
+          bounding memory use on long arms
+        """
+        rng = np.random.default_rng(self.seed)
+        cells = self.resolution * self.resolution
+        best = np.full(cells, np.inf)
+        seeds = self.seeds.reshape(cells, self.num_links)
+
+        # Joint value closest to straight, which the samples are pulled towards
+        straight = min(max(0.0, self.rot_start), self.rot_end)
+        min_dist, max_dist = np.inf, 0.0
+
+        rows = max(1, chunk_size // self.num_links)
+        for start in range(0, self.samples, rows):
+            count = min(rows, self.samples - start)
+            configs = rng.uniform(self.rot_start, self.rot_end, (count, self.num_links))
+
+            # Uniform joints curl long arms up near the base, so straighten
+            # each sample by a random amount to also cover the outer workspace
+            stretch = rng.uniform(0.0, 1.0, (count, 1))
+            configs[:, 1:] = straight + stretch * (configs[:, 1:] - straight)
+
+            ends = batch_forward_kinematics(np.zeros(2), self.link_length, configs)
+            dists = np.linalg.norm(ends, axis=1)
+            min_dist = min(min_dist, dists.min())
+            max_dist = max(max_dist, dists.max())
+
+            # Bin each end effector and measure it from its cell's centre
+            grid = np.floor((ends + self.radius) / self.cell_size).astype(np.int64)
+            np.clip(grid, 0, self.resolution - 1, out=grid)
+            centres = (grid + 0.5) * self.cell_size - self.radius
+            dist = np.sum((ends - centres) ** 2, axis=1)
+            flat = grid[:, 0] * self.resolution + grid[:, 1]
+
+            # Closest sample of each cell in this chunk
+            order = np.lexsort((dist, flat))
+            cell_ids, first = np.unique(flat[order], return_index=True)
+            winners = order[first]
+
+            # Keep it if it beats the best so far
+            improved = dist[winners] < best[cell_ids]
+            best[cell_ids[improved]] = dist[winners[improved]]
+            seeds[cell_ids[improved]] = configs[winners[improved]]
+
+        self.has_seed = np.isfinite(best).reshape(self.resolution, self.resolution)
+        self.min_reach, self.max_reach = self.__reach(min_dist, max_dist)
+
+        # Cells with any point inside the annulus
+        edges = np.arange(self.resolution + 1) * self.cell_size - self.radius
+        lo, hi = edges[:-1], edges[1:]
+        near = np.where(lo > 0, lo, np.where(hi < 0, -hi, 0.0))
+        far = np.maximum(np.abs(lo), np.abs(hi))
+        near_dist = np.hypot(near[:, np.newaxis], near[np.newaxis])
+        far_dist = np.hypot(far[:, np.newaxis], far[np.newaxis])
+        self.reachable = (near_dist <= self.max_reach) & (far_dist >= self.min_reach)
+
+    def __reach(self, min_dist: float, max_dist: float) -> Tuple[float, float]:
+        """
+        Get the closest and furthest the end effector gets from the base
+
+        Args:
+        - min_dist: The closest any sample got
+        - max_dist: The furthest any sample got
+
+        Returns:
+        - The inner and outer radius of the reachable annulus
+        """
+        n, length = self.num_links, self.link_length
+        if n == 1:
+            return length, length
+
+        # Only the joints after the first bend the arm
+        full_turn = self.rot_end - self.rot_start >= 2 * np.pi
+        if self.rot_start <= 0.0 <= self.rot_end:
+            max_reach = n * length
+        else:
+            # Bending every joint as little as possible curls the
+            # arm into an arc of a circle
+            bend = self.rot_start if self.rot_start > 0.0 else self.rot_end
+            arc = length * abs(np.sin(n * bend / 2) / np.sin(bend / 2))
+            max_reach = max(arc, max_dist)
+
+        if full_turn:
+            min_reach = 0.0
+        else:
+            # No closed form once the joints are limited, so trust the
+            # samples, less a cell as they miss the very closest poses
+            min_reach = max(0.0, min_dist - self.cell_size)
+
+        return min_reach, max_reach
+
+    def cell(self, base: np.ndarray, target: np.ndarray) -> Optional[Tuple[int, int]]:
+        """
+        Get the cell of a target relative to the base
+
+        Args:
+        - base: The base position of the arm
+        - target: The target
+
+        Returns:
+        - The cell, or None if it is outside the grid
+        """
+        rel = (np.asarray(target, dtype=np.float64) - base + self.radius) / self.cell_size
+        x, y = int(np.floor(rel[0])), int(np.floor(rel[1]))
+
+        if not (0 <= x < self.resolution and 0 <= y < self.resolution):
+            return None
+
+        return (x, y)
+
+    def is_reachable(self, arm: Any, target: np.ndarray) -> bool:
+        """
+        Check if an arm can reach a target
+
+        Args:
+        - arm: The arm
+        - target: The target
+
+        Returns:
+        - If the target is reachable
+        """
+        dist = np.linalg.norm(np.asarray(target, dtype=np.float64) - arm.pos)
+        return bool(self.min_reach <= dist <= self.max_reach)
+
+    def get_seed(self, arm: Any, target: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Get joint angles which end up close to a target
+
+        Args:
+        - arm: The arm
+        - target: The target
+
+        Returns:
+        - The joint angles, or None if the cell has no seed
+        """
+        cell = self.cell(arm.pos, target)
+        if cell is None or not self.has_seed[cell]:
+            return None
+
+        return self.seeds[cell].copy()
+
+    def path(self, cache_dir: str = CACHE_DIR) -> str:
+        """
+        Get the file the map is cached in
+
+        Args:
+        - cache_dir: The cache directory
+
+        Returns:
+        - The path
+        """
+        digest = hashlib.sha1(repr(self.key).encode()).hexdigest()[:16]
+        return os.path.join(cache_dir, f"workspace_{digest}.npz")
+
+    def save(self, cache_dir: str = CACHE_DIR) -> None:
+        """
+        Save the map to the cache directory
+
+        Args:
+        - cache_dir: The cache directory
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez_compressed(
+            self.path(cache_dir),
+            key=np.array(self.key, dtype=np.float64),
+            reachable=self.reachable,
+            has_seed=self.has_seed,
+            seeds=self.seeds,
+            reach=np.array([self.min_reach, self.max_reach]),
+        )
+
+    def load(self, cache_dir: str = CACHE_DIR) -> bool:
+        """
+        Load the map from the cache directory
+
+        Args:
+        - cache_dir: The cache directory
+
+        Returns:
+        - If a matching map was found
+        """
+        path = self.path(cache_dir)
+        if not os.path.exists(path):
+            return False
+
+        with np.load(path) as data:
+            if not np.array_equal(data["key"], np.array(self.key, dtype=np.float64)):
+                return False
+
+            # Maps cached before the reach was stored sampled their seeds differently
+            if "reach" not in data:
+                return False
+
+            self.reachable = data["reachable"]
+            self.has_seed = data["has_seed"]
+            self.seeds = data["seeds"]
+            self.min_reach, self.max_reach = (float(r) for r in data["reach"])
+
+        return True
+
+    @classmethod
+    def for_arm(cls, arm: Any, cache_dir: Optional[str] = CACHE_DIR, **kwargs: Any) -> WorkspaceMap:
+        """
+        Get the map of an arm's configuration, loading it from
+        memory or disk if it has been built before
+
+        Args:
+        - arm: The arm
+        - cache_dir: The cache directory, None to not use the disk
+        - kwargs: Passed to WorkspaceMap
+
+        Returns:
+        - The map
+        """
+        key = cls.make_key(arm.link_length, arm.num_links, **kwargs)
+        if key in _MAPS:
+            return _MAPS[key]
+
+        workspace = cls(arm.link_length, arm.num_links, build=False, **kwargs)
+        if cache_dir is None or not workspace.load(cache_dir):
+            workspace.build()
+            if cache_dir is not None:
+                workspace.save(cache_dir)
+
+        _MAPS[key] = workspace
+        return workspace
@@ -0,0 +1,245 @@
+from typing import *
+import argparse
+import json
+import platform
+import subprocess
+import time
+import numpy as np
+
+from arm.arm import Arm
+from arm import controllers
+
+# Shown by --help
+USAGE = """
+Benchmark every IK controller across chain lengths and target distributions
+
+Every controller solves the same seeded targets for each number of
+links, starting from the arm's default pose. A solve calls
+controller.update (one call per frame in the simulation) until the
+end effector is within TOLERANCE of the target, or MAX_UPDATES
+calls or TIME_BUDGET seconds have passed.
+
+Results are written as JSON so runs on different commits can be
+compared with --compare.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --links 2 8 32 --controllers DLS FABRIK
+    python benchmark.py --output new.json --compare old.json
+"""
+
+# Distance to the target counted as solved
+TOLERANCE = 1.0
+# Total reach of every arm, link lengths are scaled to match
+REACH = 300.0
+# Base position of every arm
+BASE = np.array([600.0, 350.0])
+
+MAX_UPDATES = 100
+TIME_BUDGET = 1.0
+
+NUM_LINKS = [2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+def make_controllers() -> Dict[str, Callable[[], controllers.base.Controller]]:
+    """
+    Get a factory for every controller under test, by name
+    """
+    return {
+        "SGD": lambda: controllers.SGDController(alpha=0.00012, weight_decay=0.001, epochs=6),
+        "JacobianTranspose": lambda: controllers.JacobianController(method="transpose"),
+        "JacobianPinv": lambda: controllers.JacobianController(method="pinv"),
+        "DLS": lambda: controllers.DLSController(tolerance=TOLERANCE),
+        "FABRIK": lambda: controllers.FABRIKController(tolerance=TOLERANCE),
+        "CCD": lambda: controllers.CCDController(tolerance=TOLERANCE),
+        "BatchDLS": lambda: controllers.BatchDLSController(tolerance=TOLERANCE),
+        "MultiStart": lambda: controllers.MultiStartController(seed=0, tolerance=TOLERANCE),
+    }
+
+
+def sample_targets(distribution: str, n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Sample targets around the base
+
+    Args:
+    - distribution: "uniform" for anywhere in reach, "far" for near the edge of reach
+    - n: The number of targets
+    - rng: The random generator
+
+    Returns:
+    - The targets, shape (n, 2)
+    """
+    if distribution == "uniform":
+        # sqrt so the targets are uniform over the area
+        radii = REACH * 0.95 * np.sqrt(rng.uniform(0, 1, n))
+    elif distribution == "far":
+        radii = REACH * rng.uniform(0.8, 0.95, n)
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+
+    angles = rng.uniform(-np.pi, np.pi, n)
+    return BASE + radii[:, np.newaxis] * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+
+def solve(controller: Any, arm: Arm, target: np.ndarray, start: np.ndarray) -> Dict[str, Any]:
+    """
+    Solve a single target from a starting pose
+
+    Returns:
+    - The wall time, update calls, reported iterations (None if the
+      controller doesn't report them), final error and whether it was solved
+    """
+    arm.set_joints(start)
+
+    updates = 0
+    iterations = 0
+    error = np.linalg.norm(target - arm.get_end_effector_pos())
+
+    t0 = time.perf_counter()
+    while error > TOLERANCE and updates < MAX_UPDATES and time.perf_counter() - t0 < TIME_BUDGET:
+        controller.update(arm, target)
+        updates += 1
+
+        # Controllers without early exit run a fixed number of epochs
+        reported = getattr(controller, "iterations", getattr(controller, "epochs", None))
+        iterations = None if reported is None or iterations is None else iterations + reported
+        error = np.linalg.norm(target - arm.get_end_effector_pos())
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "time": elapsed,
+        "updates": updates,
+        "iterations": iterations,
+        "error": float(error),
+        "solved": bool(error <= TOLERANCE),
+    }
+
+
+def run(
+        names: List[str],
+        num_links: List[int],
+        distributions: List[str],
+        num_targets: int,
+        seed: int,
+) -> List[Dict[str, Any]]:
+    """
+    Run every combination of controller, chain length and distribution
+
+    Returns:
+    - One summary row per combination
+    """
+    factories = make_controllers()
+    rows = []
+
+    for n in num_links:
+        for distribution in distributions:
+            # Same targets for every controller
+            targets = sample_targets(distribution, num_targets, np.random.default_rng(seed))
+
+            for name in names:
+                controller = factories[name]()
+                arm = Arm(BASE, REACH / n, n, (255, 255, 255))
+                start = arm.joints.copy()
+
+                solves = [solve(controller, arm, target, start) for target in targets]
+                times = np.array([s["time"] for s in solves])
+                iterations = [s["iterations"] for s in solves]
+                errors = np.array([s["error"] for s in solves])
+
+                row = {
+                    "controller": name,
+                    "num_links": n,
+                    "distribution": distribution,
+                    "targets": num_targets,
+                    "success_rate": float(np.mean([s["solved"] for s in solves])),
+                    "mean_time": float(np.mean(times)),
+                    "median_time": float(np.median(times)),
+                    "max_time": float(np.max(times)),
+                    "mean_updates": float(np.mean([s["updates"] for s in solves])),
+                    "mean_iterations": None if None in iterations else float(np.mean(iterations)),
+                    "mean_error": float(np.mean(errors)),
+                    "max_error": float(np.max(errors)),
+                }
+                rows.append(row)
+
+                mean_iterations = row["mean_iterations"]
+                iterations_text = "?" if mean_iterations is None else f"{mean_iterations:.1f}"
+                print(
+                    f"{name:>18} n={n:<4} {distribution:>8}: "
+                    f"success {row['success_rate']:.0%}, "
+                    f"{row['mean_time'] * 1000:.2f} ms/solve, "
+                    f"{iterations_text} iterations, "
+                    f"error {row['mean_error']:.3f}"
+                )
+
+                if hasattr(controller, "close"):
+                    controller.close()
+
+    return rows
+
+
+def git_commit() -> Optional[str]:
+    """
+    Get the current commit, if this is a git checkout
+    """
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    """
+    Print how each row changed between two benchmark results
+    """
+    def key(row: Dict[str, Any]) -> Tuple:
+        return (row["controller"], row["num_links"], row["distribution"])
+
+    old_rows = {key(row): row for row in old["results"]}
+
+    for row in new["results"]:
+        prev = old_rows.get(key(row))
+        if prev is None:
+            continue
+
+        speedup = prev["mean_time"] / row["mean_time"] if row["mean_time"] > 0 else float("inf")
+        print(
+            f"{row['controller']:>18} n={row['num_links']:<4} {row['distribution']:>8}: "
+            f"{speedup:.2f}x speed, "
+            f"success {prev['success_rate']:.0%} -> {row['success_rate']:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=USAGE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--controllers", nargs="+", default=list(make_controllers().keys()))
+    parser.add_argument("--links", nargs="+", type=int, default=NUM_LINKS)
+    parser.add_argument("--distributions", nargs="+", default=["uniform", "far"])
+    parser.add_argument("--targets", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against a previous JSON file")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "seed": args.seed,
+            "tolerance": TOLERANCE,
+            "max_updates": MAX_UPDATES,
+            "time_budget": TIME_BUDGET,
+        },
+        "results": run(args.controllers, args.links, args.distributions, args.targets, args.seed),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
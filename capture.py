@@ -0,0 +1,244 @@
+from typing import *
+import os
+import queue
+import threading
+import numpy as np
+import pygame
+
+import constants as const
+
+"""
+This module contains the FrameCapture class, which records the
+frames of a simulation without stalling it
+
+Each frame's pixels are copied into a bounded queue, and a
+background thread compresses and writes them out, either as
+chunked .npz archives (frames and ticks arrays) or as a video
+file (needs imageio with ffmpeg, which is optional).
+
+When the writer falls behind and the queue fills up, frames are
+never waited for. Depending on the policy they are either
+dropped, or captured less often until the writer catches up.
+Errors from the writer are raised by close, which check_write_failure
+verifies never hangs:
+
+    python capture.py
+"""
+
+class FrameCapture:
+    # Policies for when the queue is full
+    POLICIES = ("drop", "throttle")
+
+    def __init__(
+            self,
+            path: str,
+            format: str = "npz",
+            chunk_size: int = 100,
+            queue_size: int = 32,
+            policy: str = "drop",
+            fps: int = const.TICK_RATE,
+    ) -> None:
+        """
+        Create a new frame capture and start its writer
+
+        Args:
+        - path: The video file, or the prefix of the .npz chunks
+          (written as <path>_00000.npz, <path>_00001.npz, ...)
+        - format: "npz" or "video"
+        - chunk_size: The frames in each .npz chunk
+        - queue_size: The most frames waiting to be written
+        - policy: "drop" to drop frames while the queue is full,
+          "throttle" to capture every other frame, then every
+          4th and so on until the writer catches up
+        - fps: The frame rate of the video
+        """
+        if format not in ("npz", "video"):
+            raise ValueError(f"Unknown format: {format}")
+        if policy not in FrameCapture.POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+
+        self.path = path
+        self.format = format
+        self.chunk_size = chunk_size
+        self.policy = policy
+        self.fps = fps
+
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        # Capture every nth frame offered, raised by the throttle policy
+        self.interval = 1
+        self.offered = 0
+
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.chunks = 0
+
+        # Errors from the writer, raised again by close
+        self.error = None
+
+        # Open the video writer up front so a missing imageio fails here
+        self.video = None
+        if format == "video":
+            import imageio
+            self.video = imageio.get_writer(path, fps=fps)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.thread = threading.Thread(target=self.__write, name="FrameCapture", daemon=True)
+        self.thread.start()
+
+    def capture(self, surface: pygame.Surface, tick: int) -> bool:
+        """
+        Offer a frame to be written, never blocking
+
+        Args:
+        - surface: The surface to copy the pixels of
+        - tick: The simulation tick of the frame
+
+        Returns:
+        - If the frame was queued
+        """
+        self.offered += 1
+        if self.offered % self.interval:
+            return False
+
+        if self.queue.full():
+            self.dropped += 1
+            if self.policy == "throttle":
+                self.interval *= 2
+            return False
+
+        # Writer caught up, so capture more often again
+        if self.interval > 1 and self.queue.qsize() < self.queue.maxsize // 4:
+            self.interval //= 2
+
+        # array3d copies the pixels, shape (width, height, 3)
+        self.queue.put_nowait((tick, pygame.surfarray.array3d(surface)))
+        self.captured += 1
+        return True
+
+    def close(self) -> Dict[str, int]:
+        """
+        Write every queued frame and stop the writer
+
+        Returns:
+        - The frames captured, dropped and written, and the chunks written
+        """
+        # Only this thread adds to the queue, so waiting here can't deadlock
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+        return {
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "written": self.written,
+            "chunks": self.chunks,
+        }
+
+    def __write(self) -> None:
+        """
+        Write frames from the queue until close
+        """
+        frames = []
+        ticks = []
+        # If close's None has been taken off the queue
+        closed = False
+
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    closed = True
+                    break
+
+                tick, pixels = item
+                # Rows first, like every image format
+                frame = pixels.swapaxes(0, 1)
+
+                if self.video is not None:
+                    self.video.append_data(frame)
+                    self.written += 1
+                    continue
+
+                frames.append(frame)
+                ticks.append(tick)
+                if len(frames) == self.chunk_size:
+                    self.__write_chunk(frames, ticks)
+                    frames, ticks = [], []
+
+            if frames:
+                self.__write_chunk(frames, ticks)
+        except Exception as e:
+            self.error = e
+            # Keep emptying the queue so capture never sees it stuck
+            # full, until close, unless that's what was being handled
+            while not closed:
+                closed = self.queue.get() is None
+        finally:
+            if self.video is not None:
+                self.video.close()
+
+    def __write_chunk(self, frames: List[np.ndarray], ticks: List[int]) -> None:
+        """
+        Write a chunk of frames to a compressed .npz archive
+        """
+        np.savez_compressed(
+            f"{self.path}_{self.chunks:05d}.npz",
+            frames=np.stack(frames),
+            ticks=np.array(ticks, dtype=np.int64),
+        )
+        self.written += len(frames)
+        self.chunks += 1
+
+
+def check_write_failure(timeout: float = 5.0) -> None:
+    """
+    Check close neither hangs nor swallows the error when writing
+    fails, both mid-capture and for the last chunk written by close
+
+    Args:
+    - timeout: How long close may take, in seconds
+
+    Raises:
+    - AssertionError: If close hangs or doesn't raise the error
+    """
+    import tempfile
+
+    surface = pygame.Surface((8, 8))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "frames")
+        # A directory where the first chunk should go makes writing it fail
+        os.mkdir(f"{path}_00000.npz")
+
+        # 5 frames only fill a chunk on close, 15 fill one mid-capture
+        for num_frames in (5, 15):
+            capture = FrameCapture(path, chunk_size=10)
+            for tick in range(num_frames):
+                capture.capture(surface, tick)
+
+            errors = []
+
+            def close() -> None:
+                try:
+                    capture.close()
+                except Exception as e:
+                    errors.append(e)
+
+            closer = threading.Thread(target=close, daemon=True)
+            closer.start()
+            closer.join(timeout)
+
+            assert not closer.is_alive(), f"close hung after a failed write of {num_frames} frames"
+            assert errors, f"close didn't raise the failed write of {num_frames} frames"
+
+
+if __name__ == "__main__":
+    check_write_failure()
+    print("close raises failed writes without hanging")
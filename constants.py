@@ -24,6 +24,19 @@ FRICTION_MULTIPLIER: float = 0.1
 # Restitution
 WALL_RESTITUTION: float = 0.4
 
+# Balls slower than this on average for SLEEP_TIME simulated time fall asleep
+SLEEP_VELOCITY: float = 2.0
+SLEEP_TIME: float = 3.0
+
+# Simulated time per tick
+TIME_STEP: float = 0.1
+# Physics steps per tick, each of TIME_STEP / SUBSTEPS
+SUBSTEPS: int = 1
+# Ticks per real second
+TICK_RATE: int = 60
+# Most ticks run before a frame is drawn when falling behind
+MAX_FRAME_SKIP: int = 5
+
 # Grid size
 GRID_SIZE: int = 50
 
@@ -32,6 +45,8 @@ ARM_WIDTH: int = 10
 
 # Font
 FONT: pygame.font.Font = pygame.font.SysFont("Arial", 20)
+# Frames drawn between updates of task descriptions shown on screen
+HUD_REFRESH_FRAMES: int = 6
 
 # Arm end radius
 ARM_END_RADIUS: int = 12
@@ -0,0 +1,159 @@
+from __future__ import annotations
+from typing import *
+import numpy as np
+import constants as const
+
+from objects import physics
+from objects import broadphase
+
+"""
+Physics backends for the ball simulations
+
+A backend is a broadphase (grid_pairs) and a set of physics kernels
+(see physics.Kernels). The numpy backend is always available, and
+the "numba" backend compiles the same kernels into loops when numba
+is installed. Every backend has the same semantics, which
+check_equivalence verifies against the numpy backend:
+
+    python -m objects.backends
+"""
+
+class Backend(NamedTuple):
+    name: str
+    grid_pairs: Callable[[np.ndarray, float], Tuple[np.ndarray, np.ndarray]]
+    kernels: physics.Kernels
+
+
+NUMPY = Backend("numpy", broadphase.grid_pairs, physics.NUMPY_KERNELS)
+
+# Names which can be passed to get_backend
+BACKENDS = ("numpy", "numba", "auto")
+
+
+def get_backend(name: str = "numpy") -> Backend:
+    """
+    Get a backend by name
+
+    Args:
+    - name: "numpy", "numba", or "auto" for numba if it's
+      installed and numpy otherwise
+
+    Returns:
+    - The backend
+    """
+    if name == "numpy":
+        return NUMPY
+
+    if name in ("numba", "auto"):
+        try:
+            from objects import numba_kernels
+        except ImportError:
+            if name == "auto":
+                return NUMPY
+            raise
+
+        return Backend("numba", numba_kernels.grid_pairs, numba_kernels.KERNELS)
+
+    raise ValueError(f"Unknown backend: {name}")
+
+
+def random_state(num_balls: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """
+    Make a crowded random set of balls, some of them overlapping,
+    outside the walls or fixed
+
+    Returns:
+    - The state arrays, by name
+    """
+    radius = rng.uniform(5, 20, num_balls)
+    return {
+        "pos": rng.uniform([-10, -10], [const.SCREEN_WIDTH + 10, const.SCREEN_HEIGHT + 10], (num_balls, 2)),
+        "vel": rng.normal(0, 50, (num_balls, 2)),
+        "acc": rng.normal(0, 5, (num_balls, 2)),
+        "radius": radius,
+        "mass": rng.uniform(0.2, 2, num_balls),
+        "active": rng.uniform(0, 1, num_balls) < 0.9,
+        "fixed": rng.uniform(0, 1, num_balls) < 0.1,
+    }
+
+
+def check_equivalence(
+        backend: Backend,
+        reference: Backend = NUMPY,
+        num_balls: int = 2000,
+        seed: int = 0,
+        rtol: float = 1e-9,
+        atol: float = 1e-9,
+) -> None:
+    """
+    Check a backend gives the same results as another,
+    running each kernel on the same random state
+
+    Args:
+    - backend: The backend to check
+    - reference: The backend to check against
+    - num_balls: The number of balls in the random state
+    - seed: The seed of the random state
+    - rtol, atol: The tolerances, as only the order of sums may differ
+
+    Raises:
+    - AssertionError: If any result differs
+    """
+    rng = np.random.default_rng(seed)
+    state = random_state(num_balls, rng)
+    # Blocks scattered over the screen
+    corners = rng.uniform(0, const.RESOLUTION, (20, 2))
+    blocks = (corners, corners + rng.uniform(10, 200, (20, 2)), rng.uniform(0.2, 1, 20), rng.uniform(0.5, 5, 20))
+    cell_size = 2 * state["radius"].max()
+
+    def pairs(grid_pairs: Callable) -> Set[Tuple[int, int]]:
+        i, j = grid_pairs(state["pos"], cell_size)
+        return set(zip(i.tolist(), j.tolist()))
+
+    expected, actual = pairs(reference.grid_pairs), pairs(backend.grid_pairs)
+    assert expected == actual, f"{backend.name}: grid_pairs found {len(actual)} pairs, expected {len(expected)}"
+
+    i, j = reference.grid_pairs(state["pos"], cell_size)
+    # Like physics.step, never pair two fixed balls
+    movable = ~(state["fixed"][i] & state["fixed"][j])
+    b = np.repeat(np.arange(num_balls), len(blocks[0]))
+    k = np.tile(np.arange(len(blocks[0])), num_balls)
+
+    calls = {
+        "apply_forces": lambda s, kernels: kernels.apply_forces(
+            s["vel"], s["acc"], s["mass"], s["active"]),
+        "resolve_ball_collisions": lambda s, kernels: kernels.resolve_ball_collisions(
+            s["pos"], s["vel"], s["acc"], s["radius"], s["mass"], i, j),
+        "resolve_ball_collisions (fixed)": lambda s, kernels: kernels.resolve_ball_collisions(
+            s["pos"], s["vel"], s["acc"], s["radius"], s["mass"], i[movable], j[movable], s["fixed"]),
+        "resolve_block_collisions": lambda s, kernels: kernels.resolve_block_collisions(
+            s["pos"], s["vel"], s["radius"], s["mass"], *blocks, b, k),
+        "apply_wall_collisions": lambda s, kernels: kernels.apply_wall_collisions(
+            s["pos"], s["vel"], s["radius"], s["active"]),
+        "integrate": lambda s, kernels: kernels.integrate(
+            s["pos"], s["vel"], s["acc"], 0.1, s["active"]),
+    }
+
+    for name, call in calls.items():
+        expected = {field: value.copy() for field, value in state.items()}
+        actual = {field: value.copy() for field, value in state.items()}
+        call(expected, reference.kernels)
+        call(actual, backend.kernels)
+
+        for field in ("pos", "vel", "acc"):
+            assert np.allclose(expected[field], actual[field], rtol=rtol, atol=atol), (
+                f"{backend.name}: {name} differs in {field} by up to "
+                f"{np.abs(expected[field] - actual[field]).max()}"
+            )
+
+
+if __name__ == "__main__":
+    for name in BACKENDS[:-1]:
+        try:
+            backend = get_backend(name)
+        except ImportError as e:
+            print(f"{name}: not available ({e})")
+            continue
+
+        check_equivalence(backend)
+        print(f"{name}: matches numpy")
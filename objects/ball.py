@@ -6,6 +6,7 @@ import numpy as np
 
 from objects.obj import Object
 from objects.block import Block
+from objects.world import WorldField
 from arm.arm import Arm
 
 """
@@ -26,10 +27,25 @@ Methods:
 """
 
 class Ball(Object):
+    # State kept in the ball's BallWorld, if it's in one
+    pos = WorldField("pos")
+    vel = WorldField("vel")
+    acc = WorldField("acc")
+    radius = WorldField("radius")
+    mass = WorldField("mass")
+    held = WorldField("held")
+    asleep = WorldField("asleep")
+    still_steps = WorldField("still_steps")
+    rest_pos = WorldField("rest_pos")
+
     def __init__(self, pos: Tuple[float, float], radius: float, mass: float, color: Tuple[int, int, int]) -> None:
         """
         Create a new ball
         """
+        # The BallWorld the ball is in, and its index there
+        self.world = None
+        self.index = None
+
         super().__init__(pos)
         self.pos = np.array(pos, dtype=np.float64)
         self.vel = np.zeros(2, dtype=np.float64)
@@ -42,6 +58,20 @@ class Ball(Object):
         self.held = False
         # The arm that is holding the ball
         self.holder = None
+
+        # If the ball has come to rest and is skipped by the physics
+        self.asleep = False
+        # The number of steps in a row the ball has been slow
+        self.still_steps = 0
+        # Where the ball was when it started being slow
+        self.rest_pos = self.pos.copy()
+
+    def wake(self) -> None:
+        """
+        Wake the ball up so it's simulated again
+        """
+        self.asleep = False
+        self.still_steps = 0
     
     def set_held(self, held: bool, holder: Optional[Arm] = None) -> None:
         """
@@ -53,10 +83,15 @@ class Ball(Object):
         """
         self.held = held
         self.holder = holder
+        self.wake()
     
     def update(self, dt: float, others: Set[Ball]) -> None:
         """
-        Update the ball
+        Update the ball on its own
+
+        ObjectManager doesn't use this for balls: it resolves each
+        touching pair once with the kernels in objects/physics.py,
+        rather than once from each ball of the pair
 
         Args:
         - dt: Delta time
@@ -80,14 +115,17 @@ class Ball(Object):
         self.vel += self.acc * dt
         self.acc = np.zeros(2, dtype=np.float64)
     
-    def draw(self, surface: pygame.Surface) -> None:
+    def draw(self, surface: pygame.Surface) -> pygame.Rect:
         """
         Draw the ball on the surface
 
         Args:
         - surface: The surface to draw on
+
+        Returns:
+        - The area drawn on
         """
-        pygame.draw.circle(surface, self.color, self.pos.astype(int), self.radius)
+        return pygame.draw.circle(surface, self.color, self.pos.astype(int), self.radius)
     
     def apply_force(self, force: np.ndarray) -> None:
         """
@@ -108,6 +146,7 @@ class Ball(Object):
         - impulse: The impulse to apply
         """
         self.vel += impulse / self.mass
+        self.wake()
 
     def apply_gravity(self) -> None:
         """
@@ -0,0 +1,200 @@
+from __future__ import annotations
+from typing import *
+import numpy as np
+import constants as const
+
+from objects import physics
+
+"""
+Array-based broadphase for the ball simulations
+
+Balls are binned into a uniform grid by sorting their cell keys,
+and every ball is paired with the balls in its own cell and in
+half of the neighbouring cells, so each candidate pair comes out
+exactly once without any per-object Python work.
+
+Static blocks are kept in their own grid (StaticGrid) which is
+only built when blocks are added.
+"""
+
+# Neighbouring cells each cell is paired with. The other half of the
+# 3x3 block is covered when those cells pair back with this one.
+HALF_STENCIL = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Concatenate the ranges [start, start + count) for every row
+
+    Args:
+    - starts: The start of each range, shape (N,)
+    - counts: The length of each range, shape (N,)
+
+    Returns:
+    - The concatenated ranges, shape (counts.sum(),)
+    """
+    total = counts.sum()
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Offset of each range's first element in the output
+    ends = np.cumsum(counts)
+    shift = np.repeat(starts - (ends - counts), counts)
+    return shift + np.arange(total)
+
+
+def grid_pairs(pos: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find every pair of balls in the same or neighbouring grid cells
+
+    Args:
+    - pos: The ball positions, shape (N, 2)
+    - cell_size: The grid cell size, at least the largest ball diameter
+
+    Returns:
+    - The indices i, j of each candidate pair, with i < j, shape (K,)
+    """
+    n = pos.shape[0]
+    if n < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    cells = np.floor(pos / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+
+    # Flatten to one key per cell, with a spare column so
+    # neighbouring keys never wrap into another row
+    height = cells[:, 1].max() + 3
+    keys = (cells[:, 0] + 1) * height + cells[:, 1] + 1
+
+    # Group the balls by cell
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    pairs_i = []
+    pairs_j = []
+
+    # Same cell: each ball with the balls after it in its cell
+    ends = np.searchsorted(sorted_keys, sorted_keys, side="right")
+    positions = np.arange(n)
+    counts = ends - positions - 1
+    pairs_i.append(order[np.repeat(positions, counts)])
+    pairs_j.append(order[expand_ranges(positions + 1, counts)])
+
+    # Neighbouring cells: each ball with every ball in the other cell
+    for dx, dy in HALF_STENCIL:
+        neighbour = keys + dx * height + dy
+        starts = np.searchsorted(sorted_keys, neighbour, side="left")
+        counts = np.searchsorted(sorted_keys, neighbour, side="right") - starts
+        pairs_i.append(np.repeat(np.arange(n), counts))
+        pairs_j.append(order[expand_ranges(starts, counts)])
+
+    i = np.concatenate(pairs_i)
+    j = np.concatenate(pairs_j)
+
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+class StaticGrid:
+    """
+    Grid index of the static blocks
+
+    Blocks are inserted once into every cell their bounds overlap,
+    grown by a margin, so a ball only needs to look up the blocks
+    of its own cell. The table is kept as sorted arrays so the
+    lookup for every ball at once is a pair of searchsorteds.
+    """
+    # Keeps negative cells positive and rows apart in the flat keys
+    OFFSET = 1 << 20
+    STRIDE = 1 << 21
+
+    def __init__(self, cell_size: float = const.GRID_SIZE) -> None:
+        """
+        Create a new empty static grid
+
+        Args:
+        - cell_size: The size of each cell
+        """
+        self.cell_size = cell_size
+        # Balls with a radius up to this are guaranteed to find every block they touch
+        self.margin = cell_size
+        self.blocks = []
+
+        self.__keys = np.zeros(0, dtype=np.int64)
+        self.__entries = np.zeros(0, dtype=np.int64)
+        self.arrays = physics.block_arrays([])
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def __key(self, cells: np.ndarray) -> np.ndarray:
+        """
+        Flatten cell coordinates into keys
+        """
+        cells = cells + StaticGrid.OFFSET
+        return cells[..., 0] * StaticGrid.STRIDE + cells[..., 1]
+
+    def add(self, block: Any) -> None:
+        """
+        Insert a block
+
+        Args:
+        - block: The block
+        """
+        self.blocks.append(block)
+        self.__build()
+
+    def __build(self) -> None:
+        """
+        Rebuild the cell table and block arrays
+        """
+        self.arrays = physics.block_arrays(self.blocks)
+        block_min, block_max = self.arrays[0], self.arrays[1]
+
+        keys = []
+        entries = []
+        for k in range(len(self.blocks)):
+            low = np.floor((block_min[k] - self.margin) / self.cell_size).astype(np.int64)
+            high = np.floor((block_max[k] + self.margin) / self.cell_size).astype(np.int64)
+
+            xs, ys = np.meshgrid(np.arange(low[0], high[0] + 1), np.arange(low[1], high[1] + 1), indexing="ij")
+            cells = np.stack([xs.ravel(), ys.ravel()], axis=1)
+            keys.append(self.__key(cells))
+            entries.append(np.full(len(cells), k, dtype=np.int64))
+
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+        entries = np.concatenate(entries) if entries else np.zeros(0, dtype=np.int64)
+
+        order = np.argsort(keys, kind="stable")
+        self.__keys = keys[order]
+        self.__entries = entries[order]
+
+    def pairs(self, pos: np.ndarray, radius: np.ndarray, active: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the blocks near each ball
+
+        Args:
+        - pos: The ball positions, shape (N, 2)
+        - radius: The ball radii, shape (N,)
+        - active: The balls to look up, shape (N,)
+
+        Returns:
+        - The ball and block index of each candidate pair, shape (K,)
+        """
+        balls = np.flatnonzero(active)
+        if len(self.blocks) == 0 or len(balls) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        # Grow the margin if a ball could reach past it
+        if radius[balls].max() > self.margin:
+            self.margin = radius[balls].max()
+            self.__build()
+
+        cells = np.floor(pos[balls] / self.cell_size).astype(np.int64)
+        keys = self.__key(cells)
+
+        starts = np.searchsorted(self.__keys, keys, side="left")
+        counts = np.searchsorted(self.__keys, keys, side="right") - starts
+
+        return np.repeat(balls, counts), self.__entries[expand_ranges(starts, counts)]
@@ -1,7 +1,13 @@
 from typing import *
 from objects.obj import Object
 from objects.block import Block
+from objects.ball import Ball
+from objects.world import BallWorld
+from objects.backends import get_backend
+from objects.broadphase import HALF_STENCIL, StaticGrid
+from objects import physics
 from arm.arm import Arm
+import numpy as np
 import pygame
 import constants as const
 
@@ -11,35 +17,54 @@ which is responsible for managing all the objects in the simulation
 """
 
 class ObjectManager:
-    def __init__(self) -> None:
+    def __init__(self, ball_world: bool = False, backend: str = "numpy") -> None:
         """
         Create a new object manager
+
+        Args:
+        - ball_world: Simulate the balls together in a BallWorld
+          instead of updating each one through the hashmap
+        - backend: The physics backend, "numpy", "numba" or "auto"
+          (see objects/backends.py)
         """
         # Moving objects
         self.dynamic_objects = set()
         # Static objects
         self.static_objects = set()
-        # Arms
-        self.arms = set()
+        # Index of the static blocks, for the ball physics
+        self.static_grid = StaticGrid()
+        # Arms, in the order they were added
+        self.arms: List[Arm] = []
 
-        self.hashmap = self.__create_hashmap()
-        self.surface = None
-    
-    def __create_hashmap(self) -> Dict[Tuple[int, int], Set[Object]]:
-        """
-        Create the spatial partitioning hashmap
+        # Targets of the arms driven by the batch controller
+        self.arm_targets: Dict[Arm, np.ndarray] = {}
+        self.batch_controller = None
 
-        Returns:
-        - The hashmap
-        """
-        hashmap = {}
-        
-        # Create the grid
-        for i in range(const.RESOLUTION[0] // const.GRID_SIZE):
-            for j in range(const.RESOLUTION[1] // const.GRID_SIZE):
-                hashmap[(i, j)] = set()
+        # Vectorized ball physics
+        self.backend = get_backend(backend)
+        self.world = BallWorld(self.backend) if ball_world else None
+
+        # Spatial partitioning hashmap, only holding non-empty cells
+        self.hashmap: Dict[Tuple[int, int], Set[Object]] = {}
+        # The cell each object in the hashmap is in
+        self.cells: Dict[Object, Tuple[int, int]] = {}
+        # The objects around each cell, kept until one of its cells changes
+        self.neighbours: Dict[Tuple[int, int], Set[Object]] = {}
 
-        return hashmap
+        self.surface = None
+        # The static objects drawn once over the background,
+        # rebuilt when one is added
+        self.background = None
+        # The areas the balls were drawn on since the surface was last
+        # cleared, and the areas of everything else, which are always dirty
+        self.drawn: List[pygame.Rect] = []
+        self.overlay: List[pygame.Rect] = []
+        # Where each ball was drawn last frame, and in what order
+        self.ball_rects: Dict[Ball, Tuple[pygame.Rect, int]] = {}
+        # The areas changed since the display was last updated
+        self.dirty: List[pygame.Rect] = []
+        # The balls in the hashmap, in draw order
+        self.balls: List[Ball] = []
 
     def __pos_to_grid(self, pos: Tuple[float, float]) -> Tuple[int, int]:
         """
@@ -68,8 +93,59 @@ class ObjectManager:
         - obj: The object to register
         """
         grid_pos = self.__pos_to_grid(obj.pos)
-        self.hashmap[grid_pos].add(obj)
-    
+        self.hashmap.setdefault(grid_pos, set()).add(obj)
+        self.cells[obj] = grid_pos
+        self.__invalidate(grid_pos)
+
+    def __unregister_object(self, obj: Object) -> None:
+        """
+        Remove an object from the hashmap
+
+        Args:
+        - obj: The object to remove
+        """
+        grid_pos = self.cells.pop(obj)
+        cell = self.hashmap[grid_pos]
+        cell.remove(obj)
+
+        # Don't keep empty cells around
+        if not cell:
+            del self.hashmap[grid_pos]
+
+        self.__invalidate(grid_pos)
+
+    def __move_object(self, obj: Object) -> None:
+        """
+        Move an object to its new cell, if it has left its old one
+
+        Args:
+        - obj: The object to move
+        """
+        if self.__pos_to_grid(obj.pos) != self.cells[obj]:
+            self.__unregister_object(obj)
+            self.__register_object(obj)
+
+    def __invalidate(self, key: Tuple[int, int]) -> None:
+        """
+        Forget the neighbours of every cell around a changed cell
+
+        Args:
+        - key: The key of the changed cell
+        """
+        for i in range(-1, 2):
+            for j in range(-1, 2):
+                self.neighbours.pop((key[0] + i, key[1] + j), None)
+
+    def __in_world(self, obj: Object) -> bool:
+        """
+        Check if an object is simulated by the ball world
+        rather than through the hashmap
+
+        Args:
+        - obj: The object
+        """
+        return self.world is not None and isinstance(obj, Ball)
+
     def set_surface(self, surface: pygame.Surface) -> None:
         """
         Set the surface to draw on
@@ -78,7 +154,31 @@ class ObjectManager:
         - surface: The surface to draw on
         """
         self.surface = surface
+        self.background = None
     
+    def set_batch_controller(self, controller: Any) -> None:
+        """
+        Set the controller that moves every targeted arm at once
+
+        Args:
+        - controller: A controller with update_all(arms, targets),
+          e.g. BatchDLSController
+        """
+        self.batch_controller = controller
+
+    def set_arm_target(self, arm: Arm, target: Optional[np.ndarray]) -> None:
+        """
+        Set the target the batch controller moves an arm towards
+
+        Args:
+        - arm: The arm
+        - target: The target, or None to stop driving the arm
+        """
+        if target is None:
+            self.arm_targets.pop(arm, None)
+        else:
+            self.arm_targets[arm] = np.array(target, dtype=np.float64)
+
     def add(self, obj: Object) -> None:
         """
         Add an object to the simulation
@@ -88,11 +188,20 @@ class ObjectManager:
         """
         if isinstance(obj, Block):
             self.static_objects.add(obj)
+            self.static_grid.add(obj)
+            # Every cell's neighbours include the static objects
+            self.neighbours.clear()
+            self.background = None
         elif isinstance(obj, Arm):
-            self.arms.add(obj)
+            self.arms.append(obj)
+        elif self.__in_world(obj):
+            self.dynamic_objects.add(obj)
+            self.world.add(obj)
         else:
             self.dynamic_objects.add(obj)
             self.__register_object(obj)
+            if isinstance(obj, Ball):
+                self.balls.append(obj)
     
     def remove(self, obj: Object) -> None:
         """
@@ -102,8 +211,14 @@ class ObjectManager:
         - obj: The object to remove
         """
         self.dynamic_objects.remove(obj)
-        grid_pos = self.__pos_to_grid(obj.pos)
-        self.hashmap[grid_pos].remove(obj)
+
+        if self.__in_world(obj):
+            self.world.remove(obj)
+            return
+
+        self.__unregister_object(obj)
+        if isinstance(obj, Ball):
+            self.balls.remove(obj)
     
     def update(self, dt: float) -> None:
         """
@@ -112,49 +227,248 @@ class ObjectManager:
         Args:
         - dt: Delta time
         """
+        if self.world is not None:
+            self.world.step(dt, self.static_grid)
         self.__update_hashmap(dt)
 
+        # Solve every targeted arm in one batch
+        if self.batch_controller is not None and self.arm_targets:
+            arms = list(self.arm_targets.keys())
+            targets = np.stack(list(self.arm_targets.values()))
+            self.batch_controller.update_all(arms, targets)
+
         for arm in self.arms:
             arm.update(dt)
     
+    def clear(self, dirty_only: bool = False) -> None:
+        """
+        Clear the surface to the background with the static
+        objects, which are only drawn once
+
+        Args:
+        - dirty_only: Only erase the areas drawn on since the last
+          clear, instead of the whole surface
+        """
+        if self.background is None or self.background.get_size() != self.surface.get_size():
+            self.background = pygame.Surface(self.surface.get_size())
+            self.background.fill(const.BG_COLOUR)
+            for obj in self.static_objects:
+                obj.draw(self.background)
+            dirty_only = False
+
+        if dirty_only:
+            for rect in self.drawn + self.overlay:
+                self.surface.blit(self.background, rect, rect)
+            # Only the balls can be redrawn the same
+            self.dirty += self.overlay
+        else:
+            self.surface.blit(self.background, (0, 0))
+            self.dirty = [self.surface.get_rect()]
+            self.ball_rects = {}
+
+        self.drawn = []
+        self.overlay = []
+
+    def add_overlay(self, rect: Optional[pygame.Rect]) -> None:
+        """
+        Note an area drawn on which isn't a ball's (e.g. by the
+        scene), so it's erased by the next clear and is dirty
+        both now and then
+
+        Args:
+        - rect: The area, or None if nothing was drawn
+        """
+        if rect is not None:
+            self.overlay.append(rect)
+            self.dirty.append(rect)
+
     def draw(self) -> None:
         """
-        Draw all the objects
+        Draw all the moving objects, over the surface
+        cleared with clear, and track the areas that changed
+        """
+        # Every ball's position, rounded like Ball.draw, in one go
+        if self.world is not None:
+            balls = self.world.balls
+            pos = self.world.pos[:self.world.count]
+        else:
+            balls = self.balls
+            pos = np.array([ball.pos for ball in balls], dtype=np.float64).reshape(-1, 2)
+
+        # A ball drawn in the same place and order as last
+        # frame looks the same, so its area isn't dirty
+        ball_rects = {}
+        for k, (ball, centre) in enumerate(zip(balls, pos.astype(int).tolist())):
+            rect = pygame.draw.circle(self.surface, ball.color, centre, ball.radius)
+            ball_rects[ball] = (rect, k)
+
+            last = self.ball_rects.pop(ball, None)
+            if last != (rect, k):
+                self.dirty.append(rect)
+                if last is not None:
+                    self.dirty.append(last[0])
+
+        # Balls which are gone
+        self.dirty += [rect for rect, _ in self.ball_rects.values()]
+        self.ball_rects = ball_rects
+        self.drawn = [rect for rect, _ in ball_rects.values()]
+
+        # Anything else can change without moving, so is always dirty
+        others = [obj for obj in self.dynamic_objects if not isinstance(obj, Ball)]
+        for obj in others + self.arms:
+            self.add_overlay(obj.draw(self.surface) or self.surface.get_rect())
+
+    def pop_dirty(self) -> List[pygame.Rect]:
+        """
+        Get the areas of the surface changed since this was last
+        called, for pygame.display.update
+
+        Returns:
+        - The changed areas
         """
-        for obj in self.dynamic_objects | self.static_objects | self.arms:
-            obj.draw(self.surface)
+        dirty = self.dirty
+        self.dirty = []
+        return dirty
     
+    def get_balls(self) -> List[Ball]:
+        """
+        Get every ball, in the order they were added
+
+        Returns:
+        - The balls
+        """
+        return self.world.balls if self.world is not None else self.balls
+
+    def reindex(self) -> None:
+        """
+        Move every object in the hashmap which has left its
+        cell, e.g. after its position was set from outside
+        """
+        for obj in list(self.cells):
+            self.__move_object(obj)
+
     def __update_hashmap(self, dt: float) -> None:
         """
         Update each cell in the hashmap independently
         """
+        # Balls are simulated together, each touching pair once
+        self.__update_balls(dt)
+
         # Update each cell
-        # Iterate over keys
-        for key in self.hashmap.keys():
-            self.__update_cell(key, dt)
-        
-        # Clear the hashmap
-        self.hashmap = self.__create_hashmap()
+        # Iterate over a copy, objects only change cells afterwards
+        for key, cell in list(self.hashmap.items()):
+            self.__update_cell(key, cell, dt)
 
-        # Re-register all the objects
-        for obj in self.dynamic_objects:
-            self.__register_object(obj)
+        # Only re-bucket the objects which left their cell
+        self.reindex()
     
-    def __update_cell(self, key: Tuple[int, int], dt: float) -> None:
+    def __update_cell(self, key: Tuple[int, int], cell: Set[Object], dt: float) -> None:
         """
-        Update a cell in the hashmap
+        Update the objects in a cell of the hashmap which
+        aren't balls (see __update_balls)
 
         Args:
         - key: The key of the cell
+        - cell: The objects in the cell
         - dt: Delta time
         """
-        # Get the neighbouring cells
-        # Include static objects
-        neighbours = self.__get_neighbours(key) | self.static_objects
+        for obj in cell:
+            if isinstance(obj, Ball):
+                continue
+
+            # Get the neighbouring cells
+            # Include static objects
+            neighbours = self.neighbours.get(key)
+            if neighbours is None:
+                neighbours = self.__get_neighbours(key) | self.static_objects
+                self.neighbours[key] = neighbours
 
-        # Update each object in the cell
-        for obj in self.hashmap[key]:
             obj.update(dt, neighbours)
+
+    def __update_balls(self, dt: float) -> None:
+        """
+        Update every ball in the hashmap with the vectorized
+        physics kernels, then write the results back
+
+        Args:
+        - dt: Delta time
+        """
+        # In the order they were added, so steps don't depend on hashmap history
+        balls = self.balls
+
+        # Nothing can happen until something wakes a ball up
+        if all(ball.asleep for ball in balls):
+            return
+
+        index = {ball: i for i, ball in enumerate(balls)}
+
+        pos = np.array([ball.pos for ball in balls], dtype=np.float64)
+        vel = np.array([ball.vel for ball in balls], dtype=np.float64)
+        acc = np.array([ball.acc for ball in balls], dtype=np.float64)
+        radius = np.array([ball.radius for ball in balls], dtype=np.float64)
+        mass = np.array([ball.mass for ball in balls], dtype=np.float64)
+        held = np.array([ball.held for ball in balls], dtype=bool)
+        asleep = np.array([ball.asleep for ball in balls], dtype=bool)
+        still_steps = np.array([ball.still_steps for ball in balls], dtype=np.int64)
+        rest_pos = np.array([ball.rest_pos for ball in balls], dtype=np.float64)
+
+        # Held balls follow the arm holding them
+        for i in np.flatnonzero(held):
+            pos[i] = balls[i].holder.get_end_effector_pos()
+
+        pairs = self.__ball_pairs(index)
+        physics.step(
+            pos, vel, acc, radius, mass, ~held, dt, pairs, self.static_grid,
+            asleep, still_steps, rest_pos, self.backend.kernels,
+        )
+
+        for i, ball in enumerate(balls):
+            ball.pos = pos[i]
+            ball.vel = vel[i]
+            ball.acc = acc[i]
+            ball.asleep = bool(asleep[i])
+            ball.still_steps = int(still_steps[i])
+            ball.rest_pos = rest_pos[i]
+
+    def __ball_pairs(self, index: Dict[Ball, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get every pair of balls in the same or neighbouring
+        cells of the hashmap, each pair once
+
+        Args:
+        - index: The index of each ball
+
+        Returns:
+        - The indices i, j of each pair, with i < j
+        """
+        cells = {}
+        # Sorted so the pairs don't depend on the hashmap's history
+        for key in sorted(self.hashmap):
+            cell = self.hashmap[key]
+            # Sorted so the pairs don't depend on set ordering
+            members = sorted(index[obj] for obj in cell if obj in index)
+            if members:
+                cells[key] = np.array(members, dtype=np.int64)
+
+        pairs_i = [np.zeros(0, dtype=np.int64)]
+        pairs_j = [np.zeros(0, dtype=np.int64)]
+
+        for key, members in cells.items():
+            # Within the cell
+            i, j = np.triu_indices(len(members), k=1)
+            pairs_i.append(members[i])
+            pairs_j.append(members[j])
+
+            # With half the neighbouring cells, the others pair back
+            for dx, dy in HALF_STENCIL:
+                others = cells.get((key[0] + dx, key[1] + dy))
+                if others is not None:
+                    pairs_i.append(np.repeat(members, len(others)))
+                    pairs_j.append(np.tile(others, len(members)))
+
+        i = np.concatenate(pairs_i)
+        j = np.concatenate(pairs_j)
+        return np.minimum(i, j), np.maximum(i, j)
     
     def __get_neighbours(self, key: Tuple[int, int]) -> Set[Object]:
         """
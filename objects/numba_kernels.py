@@ -0,0 +1,340 @@
+from __future__ import annotations
+from typing import *
+import math
+import numba
+import numpy as np
+import constants as const
+
+from objects import physics
+from objects.broadphase import HALF_STENCIL
+
+"""
+Compiled versions of the ball physics kernels and broadphase,
+for the "numba" backend (see objects/backends.py)
+
+Each kernel is a plain loop over the balls or pairs, so it needs no
+temporary arrays. They keep the semantics of the numpy kernels in
+objects/physics.py exactly: every pair is computed from the same
+state and the results are summed afterwards. Only the order of the
+sums differs, so results match to rounding.
+
+Needs numba, which is optional.
+"""
+
+# Numba freezes globals when compiling, so copy them out of the modules
+GRAVITY = const.GRAVITY
+DRAG_FRICTION = const.DRAG_FRICTION_MULTIPLIER
+FRICTION = const.FRICTION_MULTIPLIER
+WALL_RESTITUTION = const.WALL_RESTITUTION
+WIDTH, HEIGHT = const.RESOLUTION
+PAIR_RESTITUTION = physics.PAIR_RESTITUTION
+PAIR_CORRECTION = physics.PAIR_CORRECTION
+PAIR_FRICTION = physics.PAIR_FRICTION
+STENCIL = np.array(HALF_STENCIL, dtype=np.int64)
+
+
+@numba.njit(cache=True)
+def apply_forces(vel: np.ndarray, acc: np.ndarray, mass: np.ndarray, active: np.ndarray) -> None:
+    """
+    Apply gravity and air drag, see physics.apply_forces
+    """
+    for a in range(len(mass)):
+        if not active[a]:
+            continue
+
+        acc[a, 1] += GRAVITY
+        drag = DRAG_FRICTION / mass[a]
+        acc[a, 0] -= vel[a, 0] * drag
+        acc[a, 1] -= vel[a, 1] * drag
+
+
+@numba.njit(cache=True)
+def _resolve_ball_collisions(
+        pos: np.ndarray,
+        vel: np.ndarray,
+        acc: np.ndarray,
+        radius: np.ndarray,
+        mass: np.ndarray,
+        i: np.ndarray,
+        j: np.ndarray,
+        fixed: np.ndarray,
+) -> None:
+    n = len(mass)
+    dpos = np.zeros((n, 2))
+    dvel = np.zeros((n, 2))
+    contacts = np.zeros(n, dtype=np.int64)
+
+    for p in range(len(i)):
+        a, b = i[p], j[p]
+        dx = pos[a, 0] - pos[b, 0]
+        dy = pos[a, 1] - pos[b, 1]
+        dist = math.hypot(dx, dy)
+
+        # Two balls in exactly the same place have no normal
+        reach = radius[a] + radius[b]
+        if not (dist < reach and dist > 0):
+            continue
+
+        inv_a = 0.0 if fixed[a] else 1 / mass[a]
+        inv_b = 0.0 if fixed[b] else 1 / mass[b]
+        share_a = 0.0 if fixed[a] else (2.0 if fixed[b] else 1.0)
+        share_b = 0.0 if fixed[b] else (2.0 if fixed[a] else 1.0)
+
+        # Impulse along the normal
+        nx, ny = dx / dist, dy / dist
+        v = (vel[a, 0] - vel[b, 0]) * nx + (vel[a, 1] - vel[b, 1]) * ny
+        impulse = -PAIR_RESTITUTION * v / (inv_a + inv_b)
+
+        dvel[a, 0] += impulse * nx * inv_a
+        dvel[a, 1] += impulse * ny * inv_a
+        dvel[b, 0] -= impulse * nx * inv_b
+        dvel[b, 1] -= impulse * ny * inv_b
+
+        # Move the balls so they don't overlap
+        correction = (reach - dist) * PAIR_CORRECTION
+        dpos[a, 0] += nx * correction * share_a
+        dpos[a, 1] += ny * correction * share_a
+        dpos[b, 0] -= nx * correction * share_b
+        dpos[b, 1] -= ny * correction * share_b
+
+        contacts[a] += 1
+        contacts[b] += 1
+
+    for a in range(n):
+        vel[a, 0] += dvel[a, 0]
+        vel[a, 1] += dvel[a, 1]
+        pos[a, 0] += dpos[a, 0]
+        pos[a, 1] += dpos[a, 1]
+
+    # Friction, twice per collision each ball is in
+    for a in range(n):
+        if contacts[a] > 0:
+            friction = PAIR_FRICTION * contacts[a] * FRICTION / mass[a]
+            acc[a, 0] -= vel[a, 0] * friction
+            acc[a, 1] -= vel[a, 1] * friction
+
+
+def resolve_ball_collisions(
+        pos: np.ndarray,
+        vel: np.ndarray,
+        acc: np.ndarray,
+        radius: np.ndarray,
+        mass: np.ndarray,
+        i: np.ndarray,
+        j: np.ndarray,
+        fixed: Optional[np.ndarray] = None,
+) -> None:
+    """
+    Resolve collisions between pairs of balls, each pair once,
+    see physics.resolve_ball_collisions
+    """
+    if len(i) == 0:
+        return
+    if fixed is None:
+        fixed = np.zeros(len(mass), dtype=np.bool_)
+    _resolve_ball_collisions(pos, vel, acc, radius, mass, i, j, fixed)
+
+
+@numba.njit(cache=True)
+def _resolve_block_collisions(
+        pos: np.ndarray,
+        vel: np.ndarray,
+        radius: np.ndarray,
+        mass: np.ndarray,
+        block_min: np.ndarray,
+        block_max: np.ndarray,
+        block_restitution: np.ndarray,
+        block_mass: np.ndarray,
+        b: np.ndarray,
+        k: np.ndarray,
+) -> None:
+    n = len(mass)
+    dpos = np.zeros((n, 2))
+    dvel = np.zeros((n, 2))
+
+    for p in range(len(b)):
+        ball, block = b[p], k[p]
+        px, py = pos[ball, 0], pos[ball, 1]
+        dx = px - min(max(px, block_min[block, 0]), block_max[block, 0])
+        dy = py - min(max(py, block_min[block, 1]), block_max[block, 1])
+        dist = math.hypot(dx, dy)
+
+        if not dist <= radius[ball]:
+            continue
+        overlap = radius[ball] - dist
+
+        # Balls touching a corner are only pushed out
+        outside_x = px < block_min[block, 0] or px > block_max[block, 0]
+        outside_y = py < block_min[block, 1] or py > block_max[block, 1]
+        corner = outside_x and outside_y
+
+        # dont divide by 0
+        if not corner and dist == 0:
+            dist = 1.0
+        if not corner and overlap == 0:
+            overlap = 1.0
+
+        # move the ball so it doesn't overlap
+        mx = dx / dist * overlap
+        my = dy / dist * overlap
+        dpos[ball, 0] += mx
+        dpos[ball, 1] += my
+
+        if corner:
+            continue
+
+        # calculate the impulse from the velocity of the ball
+        # and the normal of the collision
+        nx = (dx + mx) / dist
+        ny = (dy + my) / dist
+        v = vel[ball, 0] * nx + vel[ball, 1] * ny
+        impulse = -block_restitution[block] * v / (1 / mass[ball] + 1 / block_mass[block])
+
+        dvel[ball, 0] += impulse * nx / mass[ball]
+        dvel[ball, 1] += impulse * ny / mass[ball]
+
+    for a in range(n):
+        pos[a, 0] += dpos[a, 0]
+        pos[a, 1] += dpos[a, 1]
+        vel[a, 0] += dvel[a, 0]
+        vel[a, 1] += dvel[a, 1]
+
+
+def resolve_block_collisions(
+        pos: np.ndarray,
+        vel: np.ndarray,
+        radius: np.ndarray,
+        mass: np.ndarray,
+        block_min: np.ndarray,
+        block_max: np.ndarray,
+        block_restitution: np.ndarray,
+        block_mass: np.ndarray,
+        b: np.ndarray,
+        k: np.ndarray,
+) -> None:
+    """
+    Resolve collisions between balls and blocks,
+    see physics.resolve_block_collisions
+    """
+    if len(b) == 0:
+        return
+    _resolve_block_collisions(pos, vel, radius, mass, block_min, block_max, block_restitution, block_mass, b, k)
+
+
+@numba.njit(cache=True)
+def apply_wall_collisions(pos: np.ndarray, vel: np.ndarray, radius: np.ndarray, active: np.ndarray) -> None:
+    """
+    Keep the balls inside the screen, see physics.apply_wall_collisions
+    """
+    for a in range(len(radius)):
+        if not active[a]:
+            continue
+
+        for axis in range(2):
+            size = WIDTH if axis == 0 else HEIGHT
+            low = pos[a, axis] - radius[a] < 0
+            high = pos[a, axis] + radius[a] > size
+
+            if low:
+                pos[a, axis] = radius[a]
+            if high:
+                pos[a, axis] = size - radius[a]
+            if low or high:
+                vel[a, axis] *= -WALL_RESTITUTION
+
+
+@numba.njit(cache=True)
+def integrate(pos: np.ndarray, vel: np.ndarray, acc: np.ndarray, dt: float, active: np.ndarray) -> None:
+    """
+    Move the balls and clear their acceleration, see physics.integrate
+    """
+    for a in range(len(active)):
+        if active[a]:
+            pos[a, 0] += vel[a, 0] * dt
+            pos[a, 1] += vel[a, 1] * dt
+            vel[a, 0] += acc[a, 0] * dt
+            vel[a, 1] += acc[a, 1] * dt
+        acc[a, 0] = 0
+        acc[a, 1] = 0
+
+
+@numba.njit(cache=True)
+def _grid_pairs(
+        order: np.ndarray,
+        sorted_keys: np.ndarray,
+        height: int,
+        out_i: np.ndarray,
+        out_j: np.ndarray,
+        fill: bool,
+) -> int:
+    """
+    Walk every candidate pair, writing them out if fill,
+    otherwise only counting them
+    """
+    n = len(order)
+    count = 0
+
+    for p in range(n):
+        a = order[p]
+        key = sorted_keys[p]
+
+        # Same cell: the balls after this one in its cell
+        q = p + 1
+        while q < n and sorted_keys[q] == key:
+            if fill:
+                out_i[count] = min(a, order[q])
+                out_j[count] = max(a, order[q])
+            count += 1
+            q += 1
+
+        # Neighbouring cells: every ball in the other cell
+        for s in range(len(STENCIL)):
+            neighbour = key + STENCIL[s, 0] * height + STENCIL[s, 1]
+            q = np.searchsorted(sorted_keys, neighbour)
+            while q < n and sorted_keys[q] == neighbour:
+                if fill:
+                    out_i[count] = min(a, order[q])
+                    out_j[count] = max(a, order[q])
+                count += 1
+                q += 1
+
+    return count
+
+
+def grid_pairs(pos: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find every pair of balls in the same or neighbouring grid cells,
+    see broadphase.grid_pairs
+    """
+    n = pos.shape[0]
+    if n < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    cells = np.floor(pos / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+
+    height = int(cells[:, 1].max()) + 3
+    keys = (cells[:, 0] + 1) * height + cells[:, 1] + 1
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    # Count the pairs first so the output can be allocated once
+    empty = np.zeros(0, dtype=np.int64)
+    count = _grid_pairs(order, sorted_keys, height, empty, empty, False)
+
+    i = np.empty(count, dtype=np.int64)
+    j = np.empty(count, dtype=np.int64)
+    _grid_pairs(order, sorted_keys, height, i, j, True)
+
+    return i, j
+
+
+KERNELS = physics.Kernels(
+    apply_forces,
+    resolve_ball_collisions,
+    resolve_block_collisions,
+    apply_wall_collisions,
+    integrate,
+)
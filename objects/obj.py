@@ -19,11 +19,14 @@ class Object:
         """
         pass
 
-    def draw(self, surface: pygame.Surface) -> None:
+    def draw(self, surface: pygame.Surface) -> Optional[pygame.Rect]:
         """
         Draw the object on the surface
 
         Args:
         - surface: The surface to draw on
+
+        Returns:
+        - The area drawn on, or None if unknown
         """
         pass
\ No newline at end of file
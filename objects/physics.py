@@ -0,0 +1,468 @@
+from __future__ import annotations
+from typing import *
+import numpy as np
+import constants as const
+
+"""
+Vectorized physics kernels shared by the ball simulations
+
+Every kernel works in place on struct-of-arrays state:
+- pos, vel, acc: shape (N, 2)
+- radius, mass: shape (N,)
+- active: boolean mask of the balls the kernel applies to, shape (N,)
+
+They follow the maths of the per-object methods in objects/ball.py.
+"""
+
+# Ball.update resolves every touching pair twice, once from each
+# ball, which is what keeps piles of balls calm. The vectorized
+# kernels resolve each pair once with the combined result:
+# - the normal velocity is scaled by -e twice, so by e² overall
+PAIR_RESTITUTION = 1 - const.WALL_RESTITUTION ** 2
+# - the overlap is cut by 0.2 from each side twice, so by 1 - 0.6²
+PAIR_CORRECTION = (1 - 0.6 ** 2) / 2
+# - friction is applied to both balls twice
+PAIR_FRICTION = 2
+
+# Gap between two balls still counted as touching when grouping them into islands
+TOUCH_SLACK = 1.0
+
+def scatter_add(target: np.ndarray, idx: np.ndarray, values: np.ndarray) -> None:
+    """
+    Add values into rows of target, summing repeated indices
+    (much faster than np.add.at)
+
+    Args:
+    - target: The array to add into, shape (N, 2)
+    - idx: The row of each value, shape (K,)
+    - values: The values, shape (K, 2)
+    """
+    n = target.shape[0]
+    target[:, 0] += np.bincount(idx, weights=values[:, 0], minlength=n)
+    target[:, 1] += np.bincount(idx, weights=values[:, 1], minlength=n)
+
+
+def apply_forces(vel: np.ndarray, acc: np.ndarray, mass: np.ndarray, active: np.ndarray) -> None:
+    """
+    Apply gravity and air drag:
+        F = m * g - μ * v
+    """
+    acc[active, 1] += const.GRAVITY
+    acc[active] -= vel[active] * (const.DRAG_FRICTION_MULTIPLIER / mass[active])[:, np.newaxis]
+
+
+def resolve_ball_collisions(
+        pos: np.ndarray,
+        vel: np.ndarray,
+        acc: np.ndarray,
+        radius: np.ndarray,
+        mass: np.ndarray,
+        i: np.ndarray,
+        j: np.ndarray,
+        fixed: Optional[np.ndarray] = None,
+) -> None:
+    """
+    Resolve collisions between pairs of balls, each pair once
+
+    Every overlapping pair gets an impulse along its normal, is
+    pushed apart, and has friction applied, with the combined result
+    of Ball.apply_collision being called from both balls. All pairs
+    are computed from the same state and summed, so the result
+    doesn't depend on the order of the pairs.
+
+    Args:
+    - i, j: The indices of the candidate pairs, shape (K,)
+    - fixed: Balls which act as immovable obstacles, shape (N,)
+    """
+    if len(i) == 0:
+        return
+
+    delta = pos[i] - pos[j]
+    dist = np.hypot(delta[:, 0], delta[:, 1])
+    touching = dist < radius[i] + radius[j]
+
+    # Two balls in exactly the same place have no normal
+    hit = touching & (dist > 0)
+    if not hit.any():
+        return
+
+    i, j, delta, dist = i[hit], j[hit], delta[hit], dist[hit]
+    inv_i = 1 / mass[i]
+    inv_j = 1 / mass[j]
+
+    # Each ball takes its share of the overlap correction,
+    # all of it if the other is fixed
+    share_i = np.ones(len(i))
+    share_j = np.ones(len(j))
+    if fixed is not None:
+        fixed_i, fixed_j = fixed[i], fixed[j]
+        inv_i[fixed_i] = 0
+        inv_j[fixed_j] = 0
+        share_i = np.where(fixed_i, 0.0, np.where(fixed_j, 2.0, 1.0))
+        share_j = np.where(fixed_j, 0.0, np.where(fixed_i, 2.0, 1.0))
+
+    # Impulse along the normal
+    n = delta / dist[:, np.newaxis]
+    v = vel[i] - vel[j]
+    impulse = -PAIR_RESTITUTION * np.einsum("ij,ij->i", v, n) / (inv_i + inv_j)
+    impulse = impulse[:, np.newaxis] * n
+
+    scatter_add(vel, i, impulse * inv_i[:, np.newaxis])
+    scatter_add(vel, j, -impulse * inv_j[:, np.newaxis])
+
+    # Move the balls so they don't overlap
+    overlap = (radius[i] + radius[j]) - dist
+    correction = n * (overlap * PAIR_CORRECTION)[:, np.newaxis]
+    scatter_add(pos, i, correction * share_i[:, np.newaxis])
+    scatter_add(pos, j, -correction * share_j[:, np.newaxis])
+
+    # Friction, twice per collision each ball is in
+    contacts = np.bincount(np.concatenate([i, j]), minlength=pos.shape[0])
+    touched = contacts > 0
+    friction = PAIR_FRICTION * contacts[touched] * const.FRICTION_MULTIPLIER / mass[touched]
+    acc[touched] -= vel[touched] * friction[:, np.newaxis]
+
+
+def resolve_block_collisions(
+        pos: np.ndarray,
+        vel: np.ndarray,
+        radius: np.ndarray,
+        mass: np.ndarray,
+        block_min: np.ndarray,
+        block_max: np.ndarray,
+        block_restitution: np.ndarray,
+        block_mass: np.ndarray,
+        b: np.ndarray,
+        k: np.ndarray,
+) -> None:
+    """
+    Resolve collisions between balls and blocks,
+    as in Ball.apply_block_collision
+
+    Args:
+    - block_min, block_max: The corners of each block, shape (M, 2)
+    - block_restitution, block_mass: The properties of each block, shape (M,)
+    - b, k: The ball and block index of each candidate pair, shape (K,)
+    """
+    if len(b) == 0:
+        return
+
+    p = pos[b]
+    nearest = np.clip(p, block_min[k], block_max[k])
+    delta = p - nearest
+    dist = np.hypot(delta[:, 0], delta[:, 1])
+
+    hit = dist <= radius[b]
+    if not hit.any():
+        return
+
+    b, k, p, delta, dist = b[hit], k[hit], p[hit], delta[hit], dist[hit]
+    overlap = radius[b] - dist
+
+    # Balls touching a corner are only pushed out
+    outside = (p < block_min[k]) | (p > block_max[k])
+    corner = outside[:, 0] & outside[:, 1]
+
+    # dont divide by 0
+    dist = np.where(~corner & (dist == 0), 1.0, dist)
+    overlap = np.where(~corner & (overlap == 0), 1.0, overlap)
+
+    # move the ball so it doesn't overlap
+    move = delta / dist[:, np.newaxis] * overlap[:, np.newaxis]
+    scatter_add(pos, b, move)
+
+    # calculate the impulse from the velocity of the ball
+    # and the normal of the collision
+    side = ~corner
+    b, k = b[side], k[side]
+    n = (delta[side] + move[side]) / dist[side, np.newaxis]
+    impulse = -block_restitution[k] * np.einsum("ij,ij->i", vel[b], n) / (1 / mass[b] + 1 / block_mass[k])
+
+    scatter_add(vel, b, impulse[:, np.newaxis] * n / mass[b, np.newaxis])
+
+
+def apply_wall_collisions(pos: np.ndarray, vel: np.ndarray, radius: np.ndarray, active: np.ndarray) -> None:
+    """
+    Keep the balls inside the screen, bouncing off the walls
+    """
+    for axis, size in enumerate(const.RESOLUTION):
+        low = active & (pos[:, axis] - radius < 0)
+        high = active & (pos[:, axis] + radius > size)
+
+        pos[low, axis] = radius[low]
+        pos[high, axis] = size - radius[high]
+
+        hit = low | high
+        vel[hit, axis] *= -const.WALL_RESTITUTION
+
+
+def integrate(pos: np.ndarray, vel: np.ndarray, acc: np.ndarray, dt: float, active: np.ndarray) -> None:
+    """
+    Move the balls and clear their acceleration
+    """
+    pos[active] += vel[active] * dt
+    vel[active] += acc[active] * dt
+    acc[:] = 0
+
+
+def block_arrays(blocks: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get the arrays resolve_block_collisions needs from a list of blocks
+
+    Returns:
+    - The top left and bottom right corners, shape (M, 2)
+    - The restitution and mass of each block, shape (M,)
+    """
+    block_min = np.array([block.pos for block in blocks], dtype=np.float64).reshape(-1, 2)
+    block_max = block_min + np.array([block.size for block in blocks], dtype=np.float64).reshape(-1, 2)
+    restitution = np.array([block.restitution for block in blocks], dtype=np.float64)
+    block_mass = np.array([block.mass for block in blocks], dtype=np.float64)
+
+    return block_min, block_max, restitution, block_mass
+
+
+def touching(
+        pos: np.ndarray,
+        radius: np.ndarray,
+        i: np.ndarray,
+        j: np.ndarray,
+        slack: float = 0.0,
+) -> np.ndarray:
+    """
+    Check which candidate pairs of balls are touching
+
+    Args:
+    - i, j: The candidate pairs
+    - slack: Extra distance still counted as touching
+
+    Returns:
+    - A mask of the touching pairs
+    """
+    delta = pos[i] - pos[j]
+    return np.hypot(delta[:, 0], delta[:, 1]) < radius[i] + radius[j] + slack
+
+
+def islands(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """
+    Label the groups of balls connected by pairs
+
+    Args:
+    - n: The number of balls
+    - i, j: The connecting pairs
+
+    Returns:
+    - The label of each ball, the lowest index in its group, shape (n,)
+    """
+    labels = np.arange(n)
+
+    while True:
+        # Spread the lowest label across every pair,
+        # then jump each label to its own label
+        low = np.minimum(labels[i], labels[j])
+        spread = labels.copy()
+        np.minimum.at(spread, i, low)
+        np.minimum.at(spread, j, low)
+        spread = spread[spread]
+
+        if np.array_equal(spread, labels):
+            return labels
+        labels = spread
+
+
+def wake_touched(
+        pos: np.ndarray,
+        vel: np.ndarray,
+        radius: np.ndarray,
+        free: np.ndarray,
+        asleep: np.ndarray,
+        still_steps: np.ndarray,
+        i: np.ndarray,
+        j: np.ndarray,
+) -> None:
+    """
+    Wake every sleeping island touched by a moving or held ball
+    A ball counts as moving if it's faster than SLEEP_VELOCITY
+
+    Args:
+    - free: The balls which aren't being held
+    - asleep, still_steps: The sleep state of each ball, updated in place
+    - i, j: The candidate ball pairs
+    """
+    if not asleep.any() or len(i) == 0:
+        return
+
+    touch = touching(pos, radius, i, j)
+    i, j = i[touch], j[touch]
+
+    # Sleepers touched by a mover
+    speed = np.hypot(vel[:, 0], vel[:, 1])
+    moving = ~asleep & ((speed >= const.SLEEP_VELOCITY) | ~free)
+    hit_i = asleep[i] & moving[j]
+    hit_j = asleep[j] & moving[i]
+    if not (hit_i.any() or hit_j.any()):
+        return
+    hit = np.concatenate([i[hit_i], j[hit_j]])
+
+    # Wake the whole island each one is in
+    both = asleep[i] & asleep[j]
+    labels = islands(len(pos), i[both], j[both])
+    woken = asleep & np.isin(labels, labels[hit])
+
+    asleep[woken] = False
+    still_steps[woken] = 0
+
+
+def update_sleep(
+        prev_pos: np.ndarray,
+        pos: np.ndarray,
+        vel: np.ndarray,
+        radius: np.ndarray,
+        dt: float,
+        free: np.ndarray,
+        asleep: np.ndarray,
+        still_steps: np.ndarray,
+        rest_pos: np.ndarray,
+        i: np.ndarray,
+        j: np.ndarray,
+) -> None:
+    """
+    Count how long each active ball has been slow, and put every
+    island of touching balls that has all been slow long enough
+    to sleep together
+
+    Balls resting on something never quite stop: they fall for a
+    few steps before the floor or the balls under them push them
+    back. So speed is measured as the average since the ball came
+    to rest, from how far it has drifted from where that was: a
+    ball that stays within SLEEP_VELOCITY * SLEEP_TIME of it for
+    SLEEP_TIME was slower than SLEEP_VELOCITY, however much it
+    jittered. Islands sleep as a whole so a ball falling asleep
+    doesn't jolt the balls resting on it.
+
+    Args:
+    - prev_pos: The positions before the step
+    - rest_pos: Where each ball came to rest, updated in place
+    - i, j: The candidate ball pairs
+    """
+    active = free & ~asleep
+
+    # Balls which weren't slow, or have just been woken, rest from here
+    starting = active & (still_steps == 0)
+    rest_pos[starting] = prev_pos[starting]
+
+    drift = pos - rest_pos
+    slow = np.hypot(drift[:, 0], drift[:, 1]) < const.SLEEP_VELOCITY * const.SLEEP_TIME
+
+    still_steps[active & slow] += 1
+    still_steps[active & ~slow] = 0
+
+    # The delay is in simulated time, so substeps don't change it
+    sleep_steps = max(1, round(const.SLEEP_TIME / dt))
+
+    # Held balls keep their whole island awake
+    ready = asleep | (free & (still_steps >= sleep_steps))
+    if not ready[active].any():
+        return
+
+    touch = touching(pos, radius, i, j, slack=TOUCH_SLACK)
+    labels = islands(len(pos), i[touch], j[touch])
+    unready = np.bincount(labels, weights=~ready, minlength=len(pos))
+
+    falling_asleep = active & (unready[labels] == 0)
+    asleep[falling_asleep] = True
+    vel[falling_asleep] = 0
+
+
+def step(
+        pos: np.ndarray,
+        vel: np.ndarray,
+        acc: np.ndarray,
+        radius: np.ndarray,
+        mass: np.ndarray,
+        free: np.ndarray,
+        dt: float,
+        ball_pairs: Tuple[np.ndarray, np.ndarray],
+        static: Optional[Any] = None,
+        asleep: Optional[np.ndarray] = None,
+        still_steps: Optional[np.ndarray] = None,
+        rest_pos: Optional[np.ndarray] = None,
+        kernels: Optional[Kernels] = None,
+) -> None:
+    """
+    Advance a set of balls by one step, in the same order as Ball.update:
+    forces, ball collisions, block collisions, walls, then integration
+
+    Sleeping balls are skipped, other than to stop the balls
+    resting on them, until something moving touches their island
+
+    Args:
+    - free: The balls which aren't being held
+    - dt: Delta time
+    - ball_pairs: The candidate ball pairs i, j, each pair once
+    - static: The StaticGrid of blocks to collide with
+    - asleep, still_steps, rest_pos: The sleep state of each ball, updated
+      in place. If not given, no ball ever sleeps
+    - kernels: The kernels to run, defaults to NUMPY_KERNELS
+    """
+    i, j = ball_pairs
+    kernels = kernels or NUMPY_KERNELS
+
+    if asleep is None:
+        asleep = np.zeros(len(pos), dtype=bool)
+        still_steps = np.zeros(len(pos), dtype=np.int64)
+        rest_pos = pos.copy()
+
+    wake_touched(pos, vel, radius, free, asleep, still_steps, i, j)
+
+    active = free & ~asleep
+    if not active.any():
+        return
+
+    # Pairs of sleepers can't do anything
+    awake = ~asleep
+    keep = awake[i] | awake[j]
+    i, j = i[keep], j[keep]
+
+    # Sleepers only act as obstacles, so undo anything done to them
+    sleepers = np.flatnonzero(asleep)
+    fixed = asleep if len(sleepers) else None
+    prev_pos = pos.copy()
+
+    kernels.apply_forces(vel, acc, mass, active)
+
+    kernels.resolve_ball_collisions(pos, vel, acc, radius, mass, i, j, fixed)
+
+    # Active balls against the blocks near them
+    if static is not None and len(static):
+        b, k = static.pairs(pos, radius, active)
+        kernels.resolve_block_collisions(pos, vel, radius, mass, *static.arrays, b, k)
+
+    kernels.apply_wall_collisions(pos, vel, radius, active)
+    kernels.integrate(pos, vel, acc, dt, active)
+
+    pos[sleepers] = prev_pos[sleepers]
+    vel[sleepers] = 0
+
+    update_sleep(prev_pos, pos, vel, radius, dt, free, asleep, still_steps, rest_pos, i, j)
+
+
+class Kernels(NamedTuple):
+    """
+    The kernels step runs, so compiled versions can be swapped in
+    (see objects/backends.py). Every set must have the same
+    semantics as the numpy kernels in this module.
+    """
+    apply_forces: Callable
+    resolve_ball_collisions: Callable
+    resolve_block_collisions: Callable
+    apply_wall_collisions: Callable
+    integrate: Callable
+
+
+NUMPY_KERNELS = Kernels(
+    apply_forces,
+    resolve_ball_collisions,
+    resolve_block_collisions,
+    apply_wall_collisions,
+    integrate,
+)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+from typing import *
+import numpy as np
+
+from objects import physics
+from objects.backends import Backend, NUMPY
+from objects.broadphase import StaticGrid
+
+"""
+This module contains the BallWorld class, which keeps the state of
+every ball in contiguous arrays so each physics step is a handful
+of vectorized operations instead of a Python loop over balls.
+
+Balls added to a world keep working as normal objects: their
+pos, vel, acc, radius, mass and held attributes become views
+into the world's arrays (see WorldField).
+"""
+
+class WorldField:
+    """
+    Attribute of a ball which lives in the ball's world once it
+    has one, and on the ball itself before that
+    """
+    def __init__(self, field: str) -> None:
+        self.field = field
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.local = "_" + name
+
+    def __get__(self, obj: Any, objtype: Optional[type] = None) -> Any:
+        if obj is None:
+            return self
+        if obj.world is None:
+            return obj.__dict__[self.local]
+        return getattr(obj.world, self.field)[obj.index]
+
+    def __set__(self, obj: Any, value: Any) -> None:
+        if obj.world is None:
+            obj.__dict__[self.local] = value
+        else:
+            getattr(obj.world, self.field)[obj.index] = value
+
+
+class BallWorld:
+    # Starting number of balls the arrays have room for
+    INITIAL_CAPACITY = 64
+    # The per-ball state kept in arrays
+    FIELDS = ("pos", "vel", "acc", "radius", "mass", "held", "asleep", "still_steps", "rest_pos")
+
+    def __init__(self, backend: Backend = NUMPY) -> None:
+        """
+        Create a new empty ball world
+
+        Args:
+        - backend: The broadphase and physics kernels to run
+        """
+        self.backend = backend
+        self.count = 0
+        self.balls = []
+
+        self.__allocate(BallWorld.INITIAL_CAPACITY)
+
+    def __allocate(self, capacity: int) -> None:
+        """
+        Resize the arrays, keeping the existing balls
+        """
+        n = self.count
+        old = self.__dict__.copy()
+
+        self.pos = np.zeros((capacity, 2), dtype=np.float64)
+        self.vel = np.zeros((capacity, 2), dtype=np.float64)
+        self.acc = np.zeros((capacity, 2), dtype=np.float64)
+        self.radius = np.zeros(capacity, dtype=np.float64)
+        self.mass = np.ones(capacity, dtype=np.float64)
+        self.held = np.zeros(capacity, dtype=bool)
+        self.asleep = np.zeros(capacity, dtype=bool)
+        self.still_steps = np.zeros(capacity, dtype=np.int64)
+        self.rest_pos = np.zeros((capacity, 2), dtype=np.float64)
+
+        if n:
+            for field in BallWorld.FIELDS:
+                getattr(self, field)[:n] = old[field][:n]
+
+    def add(self, ball: Any) -> None:
+        """
+        Move a ball's state into the world
+
+        Args:
+        - ball: The ball to add
+        """
+        if ball.world is not None:
+            raise ValueError("ball is already in a world")
+
+        if self.count == len(self.radius):
+            self.__allocate(2 * self.count)
+
+        i = self.count
+        self.pos[i] = ball.pos
+        self.vel[i] = ball.vel
+        self.acc[i] = ball.acc
+        self.radius[i] = ball.radius
+        self.mass[i] = ball.mass
+        self.held[i] = ball.held
+        self.asleep[i] = ball.asleep
+        self.still_steps[i] = ball.still_steps
+        self.rest_pos[i] = ball.rest_pos
+
+        ball.world = self
+        ball.index = i
+        self.balls.append(ball)
+        self.count += 1
+
+    def remove(self, ball: Any) -> None:
+        """
+        Move a ball's state back out of the world
+
+        Args:
+        - ball: The ball to remove
+        """
+        if ball.world is not self:
+            raise ValueError("ball is not in this world")
+
+        i = ball.index
+        state = {field: np.copy(getattr(ball, field)) for field in BallWorld.FIELDS}
+
+        # Move the last ball into the gap
+        last = self.count - 1
+        if i != last:
+            for field in BallWorld.FIELDS:
+                array = getattr(self, field)
+                array[i] = array[last]
+            self.balls[i] = self.balls[last]
+            self.balls[i].index = i
+
+        self.balls.pop()
+        self.count -= 1
+
+        ball.world = None
+        ball.index = None
+        for field, value in state.items():
+            setattr(ball, field, value if value.ndim else value.item())
+
+    def step(self, dt: float, static: Optional[StaticGrid] = None) -> None:
+        """
+        Advance every ball by one step
+
+        Args:
+        - dt: Delta time
+        - static: The grid of static blocks to collide with
+        """
+        n = self.count
+        if n == 0:
+            return
+
+        pos, vel, acc = self.pos[:n], self.vel[:n], self.acc[:n]
+        radius, mass, held = self.radius[:n], self.mass[:n], self.held[:n]
+        asleep, still_steps, rest_pos = self.asleep[:n], self.still_steps[:n], self.rest_pos[:n]
+
+        # Held balls follow the arm holding them
+        for i in np.flatnonzero(held):
+            pos[i] = self.balls[i].holder.get_end_effector_pos()
+        free = ~held
+
+        # Every pair of nearby balls, once. Cells one diameter across
+        # (plus the slack of the sleep islands) find every touching pair,
+        # and any bigger only adds pairs that can't touch
+        cell_size = 2 * radius.max() + physics.TOUCH_SLACK
+        pairs = self.backend.grid_pairs(pos, cell_size)
+
+        physics.step(
+            pos, vel, acc, radius, mass, free, dt, pairs, static,
+            asleep, still_steps, rest_pos, self.backend.kernels,
+        )
@@ -0,0 +1,275 @@
+from typing import *
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import ast
+import contextlib
+import functools
+import io
+import itertools
+import json
+import time
+import numpy as np
+
+import sim
+import scenes
+from arm import controllers
+from arm.controllers.base import Controller
+
+# Shown by --help
+USAGE = """
+Run many headless simulations of a scene across a process pool
+
+Every combination of controller parameters and seed is its own
+independent simulation. Each one runs until the scene's task
+manager has handled every task, or MAX_TICKS ticks have passed,
+and reports one row of metrics:
+- sim_time: The simulated time to completion, None if it didn't finish
+- delivered: The balls delivered, for scenes with count_delivered
+- solver_time: The wall time spent inside the controller
+
+Usage:
+    python scenarios.py --param alpha=0.0001,0.00012 --param epochs=4,6 --seeds 0 1 2
+    python scenarios.py --controller DLSController --fixed tolerance=1.0 --output runs.json
+"""
+
+MAX_TICKS = 20_000
+
+# Settings used for a controller unless overridden, as in main.py
+DEFAULT_PARAMS = {
+    "SGDController": {"alpha": 0.00012, "weight_decay": 0.001, "epochs": 6},
+}
+
+
+class TimedController(Controller):
+    """
+    Controller wrapper which times every update of the wrapped controller
+    """
+    def __init__(self, controller: Controller) -> None:
+        """
+        Wrap a controller
+
+        Args:
+        - controller: The controller to time
+        """
+        self.controller = controller
+        # Wall time spent in update so far
+        self.time = 0.0
+
+    def update(self, arm: Any, target: np.ndarray) -> None:
+        t0 = time.perf_counter()
+        self.controller.update(arm, target)
+        self.time += time.perf_counter() - t0
+
+    def is_reachable(self, arm: Any, target: np.ndarray) -> bool:
+        return self.controller.is_reachable(arm, target)
+
+    def get_state(self, arms: Sequence[Any]) -> np.ndarray:
+        return self.controller.get_state(arms)
+
+    def set_state(self, arms: Sequence[Any], state: np.ndarray) -> None:
+        self.controller.set_state(arms, state)
+
+
+def factory_name(factory: Callable[..., Controller]) -> str:
+    """
+    Get a readable name for a controller factory
+    """
+    if isinstance(factory, functools.partial):
+        return factory_name(factory.func)
+    return getattr(factory, "__name__", repr(factory))
+
+
+def make_jobs(
+        scene: type,
+        factory: Callable[..., Controller],
+        grid: Dict[str, List[Any]],
+        seeds: List[int],
+        max_ticks: int = MAX_TICKS,
+        ball_world: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Make a job for every combination of parameters and seed
+
+    Args:
+    - scene: The scene class
+    - factory: Called with each combination of parameters to make
+      the controller. Must be picklable, e.g. a controller class or
+      a functools.partial of one
+    - grid: The values to try for each parameter
+    - seeds: The seeds to run each combination with
+    - max_ticks: The most ticks to run each simulation for
+    - ball_world: Simulate the balls with the vectorized BallWorld
+
+    Returns:
+    - The jobs, for run_job
+    """
+    names = list(grid.keys())
+    jobs = []
+
+    for values in itertools.product(*(grid[name] for name in names)):
+        for seed in seeds:
+            jobs.append({
+                "scene": scene,
+                "factory": factory,
+                "params": dict(zip(names, values)),
+                "seed": seed,
+                "max_ticks": max_ticks,
+                "ball_world": ball_world,
+            })
+
+    return jobs
+
+
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one headless simulation
+
+    Args:
+    - job: The job, from make_jobs
+
+    Returns:
+    - The row of metrics
+    """
+    # The scenes use the global random state
+    np.random.seed(job["seed"])
+
+    t0 = time.perf_counter()
+
+    # The scenes and tasks print as they're set up
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation = sim.Simulation(job["ball_world"], headless=True)
+        simulation.set_scene(job["scene"])
+
+        controller = TimedController(job["factory"](**job["params"]))
+        simulation.set_controller(controller)
+
+        scene = simulation.scene
+        task_manager = getattr(scene, "taskManager", None)
+        if task_manager is None:
+            stats = simulation.step(job["max_ticks"])
+            stats["done"] = False
+        else:
+            stats = simulation.run_until(lambda _: task_manager.done, job["max_ticks"])
+
+    delivered = scene.count_delivered() if hasattr(scene, "count_delivered") else None
+
+    return {
+        "scene": job["scene"].__name__,
+        "controller": factory_name(job["factory"]),
+        **job["params"],
+        "seed": job["seed"],
+        "done": stats["done"],
+        "ticks": stats["total_ticks"],
+        "sim_time": stats["sim_time"] if stats["done"] else None,
+        "delivered": delivered,
+        "solver_time": controller.time,
+        "wall_time": time.perf_counter() - t0,
+    }
+
+
+def run_batch(
+        scene: type,
+        factory: Callable[..., Controller],
+        grid: Dict[str, List[Any]],
+        seeds: List[int],
+        max_ticks: int = MAX_TICKS,
+        ball_world: bool = False,
+        workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run every combination of parameters and seed, in parallel
+
+    Args:
+    - workers: The number of processes, defaults to one per CPU.
+      1 runs every job in this process
+    - Others: See make_jobs
+
+    Returns:
+    - One row of metrics per job, in the order of make_jobs
+    """
+    jobs = make_jobs(scene, factory, grid, seeds, max_ticks, ball_world)
+
+    if workers == 1:
+        return [run_job(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_job, jobs))
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """
+    Print the rows as an aligned table
+    """
+    if not rows:
+        return
+
+    def fmt(value: Any) -> str:
+        if isinstance(value, float):
+            return f"{value:.4g}"
+        return "-" if value is None else str(value)
+
+    columns = list(rows[0].keys())
+    cells = [[fmt(row[column]) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[k]) for line in cells)) for k, column in enumerate(columns)]
+
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for line in cells:
+        print("  ".join(cell.rjust(width) for cell, width in zip(line, widths)))
+
+
+def parse_value(text: str) -> Any:
+    """
+    Parse a command line value as a Python literal, or keep it as a string
+    """
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def parse_params(items: List[str], multiple: bool) -> Dict[str, Any]:
+    """
+    Parse name=value arguments, with comma separated values if multiple
+    """
+    params = {}
+    for item in items:
+        name, _, text = item.partition("=")
+        if multiple:
+            params[name] = [parse_value(value) for value in text.split(",")]
+        else:
+            params[name] = parse_value(text)
+    return params
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=USAGE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scene", default="FillJarScene")
+    parser.add_argument("--controller", default="SGDController")
+    parser.add_argument("--param", action="append", default=[], help="name=v1,v2,... to sweep")
+    parser.add_argument("--fixed", action="append", default=[], help="name=value passed to every controller")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    parser.add_argument("--ball-world", action="store_true")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", help="Write the rows to this JSON file")
+    args = parser.parse_args()
+
+    # Swept parameters override the fixed ones
+    fixed = {**DEFAULT_PARAMS.get(args.controller, {}), **parse_params(args.fixed, multiple=False)}
+    factory = functools.partial(getattr(controllers, args.controller), **fixed)
+    grid = parse_params(args.param, multiple=True)
+
+    rows = run_batch(
+        getattr(scenes, args.scene),
+        factory,
+        grid,
+        args.seeds,
+        args.max_ticks,
+        args.ball_world,
+        args.workers,
+    )
+    print_table(rows)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
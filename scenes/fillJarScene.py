@@ -185,9 +185,34 @@ class FillJarScene(SceneSetter):
                     np.random.uniform(-50, 50, 2)
                 )
     
+    def count_delivered(self) -> int:
+        """
+        Count the balls resting inside the right jar
+
+        Returns:
+        - The number of balls, not counting a held ball
+        """
+        left, bottom, right = self.rightJar
+        x_min = left.pos[0] + left.size[0]
+        x_max = right.pos[0]
+        y_min = left.pos[1]
+        y_max = bottom.pos[1]
+
+        return sum(
+            1 for ball in self.balls
+            if not ball.held
+            and x_min <= ball.pos[0] <= x_max
+            and y_min <= ball.pos[1] <= y_max
+        )
+
     def update(self, sim: Any, dt: float) -> None:
         """
         Update the scene
         """
         self.taskManager.update()
-        self.taskManager.draw(sim.surface)
\ No newline at end of file
+
+    def draw(self, sim: Any) -> None:
+        """
+        Draw the current task
+        """
+        sim.objects.add_overlay(self.taskManager.draw(sim.surface))
\ No newline at end of file
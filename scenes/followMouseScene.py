@@ -43,8 +43,11 @@ class FollowMouseScene(SceneSetter):
         """
 
         # Update the arm
-        target = np.array(pygame.mouse.get_pos())
-        self.controller.update(self.arm, target)
+        self.target = np.array(pygame.mouse.get_pos())
+        self.controller.update(self.arm, self.target)
 
-        # draw target
-        pygame.draw.circle(sim.surface, (214, 119, 30), target, 5)
+    def draw(self, sim: Any) -> None:
+        """
+        Draw the target
+        """
+        sim.objects.add_overlay(pygame.draw.circle(sim.surface, (214, 119, 30), self.target, 5))
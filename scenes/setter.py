@@ -33,4 +33,12 @@ class SceneSetter:
         """
         Update the scene
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def draw(self, sim: Any) -> None:
+        """
+        Draw anything the scene shows besides its objects, once
+        per frame drawn rather than every tick. Anything drawn
+        must be passed to sim.objects.add_overlay
+        """
+        pass
\ No newline at end of file
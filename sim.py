@@ -1,3 +1,5 @@
+from typing import *
+import time
 import pygame
 import constants as const
 import numpy as np
@@ -7,17 +9,71 @@ from objects.block import Block
 from objects.manager import ObjectManager
 from scenes.setter import SceneSetter
 from arm.controllers.base import Controller
+from capture import FrameCapture
+from snapshot import SnapshotLog, take_snapshot
 
 class Simulation:
     """
     The main simulation class
     """
-    def __init__(self) -> None:
+    def __init__(
+            self,
+            ball_world: bool = False,
+            time_step: float = const.TIME_STEP,
+            substeps: int = const.SUBSTEPS,
+            tick_rate: int = const.TICK_RATE,
+            max_frame_skip: int = const.MAX_FRAME_SKIP,
+            headless: bool = False,
+            backend: str = "numpy",
+            dirty_rects: bool = False,
+    ) -> None:
+        """
+        Create a new simulation
+
+        The simulation advances in fixed ticks of time_step, tick_rate
+        times per real second, however long drawing takes. Each tick
+        updates the scene once and the physics substeps times.
+
+        Args:
+        - ball_world: Simulate the balls with the vectorized BallWorld
+        - time_step: Simulated time per tick
+        - substeps: Physics steps per tick, more is more stable but slower
+        - tick_rate: Ticks per real second
+        - max_frame_skip: Most ticks run before a frame is drawn when
+          the simulation falls behind, after which it slows down instead
+        - headless: Never open a window or draw, the simulation is
+          then advanced with step and run_until
+        - backend: The physics backend, "numpy", "numba" or "auto"
+        - dirty_rects: Only erase, redraw and update the areas of the
+          window that changed each frame, instead of all of it
+        """
+        if max_frame_skip < 1:
+            raise ValueError("max_frame_skip must be at least 1")
+
         self.running = False
-        self.objects = ObjectManager()
-        
-        pygame.init()
-        pygame.display.set_caption("Inverse Kinematics")
+        self.objects = ObjectManager(ball_world, backend)
+
+        self.time_step = time_step
+        self.substeps = substeps
+        self.tick_rate = tick_rate
+        self.max_frame_skip = max_frame_skip
+        self.dirty_rects = dirty_rects
+
+        # Ticks run and simulated time so far
+        self.ticks = 0
+        self.time = 0.0
+
+        self.headless = headless
+        self.surface = None
+
+        # Records the frames drawn by run
+        self.capture = None
+        # Records the state at the start of every tick
+        self.snapshot_log = None
+
+        if not headless:
+            pygame.init()
+            pygame.display.set_caption("Inverse Kinematics")
     
     def set_scene(self, scene: SceneSetter) -> None:
         """
@@ -38,13 +94,41 @@ class Simulation:
         """
         self.scene.set_controller(controller)
     
+    def set_capture(self, capture: Optional[FrameCapture]) -> None:
+        """
+        Record every frame drawn by run, the capture is
+        closed when run stops
+
+        Args:
+        - capture: The frame capture, or None to stop recording
+        """
+        self.capture = capture
+
+    def set_snapshot_log(self, log: Optional[SnapshotLog]) -> None:
+        """
+        Record a snapshot of the simulation at the start of
+        every tick, so frame k of the log is tick k
+
+        Args:
+        - log: The snapshot log, or None to stop recording
+        """
+        self.snapshot_log = log
+
     def run(self) -> None:
         """
-        Run the simulation
+        Run the simulation in a window
         """
+        if self.headless:
+            raise RuntimeError("a headless simulation has no window, use step or run_until")
+
         self.surface = pygame.display.set_mode(const.RESOLUTION)
         self.objects.set_surface(self.surface)
 
+        # Real time between ticks
+        tick_time = 1 / self.tick_rate
+        # Real time not yet simulated
+        accumulator = 0.0
+
         # Create a clock to limit the framerate
         clock = pygame.time.Clock()
 
@@ -53,29 +137,121 @@ class Simulation:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.running = False
-            
-            # Get delta time
-            # dt = clock.tick() / 1000
-            dt = 0.1
-
-            # Clear the screen
-            self.surface.fill(const.BG_COLOUR)
-
-            # Update the objects
-            self.scene.update(self, dt)
-            self.__update_objects(dt)
-            
-            pygame.display.update()
-
-            # Limit the framerate
-            clock.tick(60)
-    
-    def __update_objects(self, dt: float) -> None:
+
+            accumulator += clock.tick(self.tick_rate) / 1000
+
+            # Catch up on the ticks due, skipping drawing in between
+            ticks = 0
+            while accumulator >= tick_time and ticks < self.max_frame_skip:
+                self.__tick()
+                accumulator -= tick_time
+                ticks += 1
+
+            # Too far behind to catch up, so slow down instead
+            if ticks == self.max_frame_skip:
+                accumulator = min(accumulator, tick_time)
+
+            # Nothing to draw if nothing has changed
+            if ticks:
+                self.objects.clear(self.dirty_rects)
+                self.scene.draw(self)
+                self.objects.draw()
+                if self.dirty_rects:
+                    pygame.display.update(self.objects.pop_dirty())
+                else:
+                    pygame.display.update()
+
+                # Copied and written on another thread, never waits
+                if self.capture is not None:
+                    self.capture.capture(self.surface, self.ticks)
+
+        if self.capture is not None:
+            print("Frame capture:", self.capture.close())
+            self.capture = None
+
+    def __tick(self) -> None:
+        """
+        Advance the simulation by one tick
+        """
+        if self.snapshot_log is not None:
+            self.snapshot_log.append(take_snapshot(self, self.snapshot_log.dtype))
+
+        self.scene.update(self, self.time_step)
+
+        # Update the objects
+        dt = self.time_step / self.substeps
+        for _ in range(self.substeps):
+            self.objects.update(dt)
+
+        self.ticks += 1
+        self.time += self.time_step
+
+    def step(self, n: int = 1) -> Dict[str, float]:
+        """
+        Advance the simulation by n ticks as fast as possible,
+        without drawing
+
+        Args:
+        - n: The number of ticks
+
+        Returns:
+        - The timing stats (see __stats)
+        """
+        t0 = time.perf_counter()
+        for _ in range(n):
+            self.__tick()
+
+        return self.__stats(n, time.perf_counter() - t0)
+
+    def run_until(
+            self,
+            predicate: Callable[["Simulation"], bool],
+            max_ticks: Optional[int] = None,
+    ) -> Dict[str, float]:
         """
-        Update all the objects
+        Advance the simulation as fast as possible, without
+        drawing, until a condition is met
 
         Args:
-        - dt: Delta time
+        - predicate: Called with the simulation before each tick,
+          stops the simulation once it returns True
+        - max_ticks: Stop after this many ticks even if the
+          condition isn't met
+
+        Returns:
+        - The timing stats (see __stats), with "done" set if
+          the condition was met
+        """
+        ticks = 0
+        done = predicate(self)
+
+        t0 = time.perf_counter()
+        while not done and (max_ticks is None or ticks < max_ticks):
+            self.__tick()
+            ticks += 1
+            done = predicate(self)
+
+        stats = self.__stats(ticks, time.perf_counter() - t0)
+        stats["done"] = done
+        return stats
+
+    def __stats(self, ticks: int, elapsed: float) -> Dict[str, float]:
+        """
+        Summarise a run of ticks
+
+        Args:
+        - ticks: The number of ticks run
+        - elapsed: The wall time they took
+
+        Returns:
+        - The ticks, wall time, ticks per second, mean wall time
+          per tick, and the total ticks and simulated time so far
         """
-        self.objects.update(dt)
-        self.objects.draw()
\ No newline at end of file
+        return {
+            "ticks": ticks,
+            "wall_time": elapsed,
+            "ticks_per_second": ticks / elapsed if elapsed > 0 else float("inf"),
+            "mean_tick_time": elapsed / ticks if ticks else 0.0,
+            "total_ticks": self.ticks,
+            "sim_time": self.time,
+        }
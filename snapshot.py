@@ -0,0 +1,356 @@
+from typing import *
+import json
+import os
+import numpy as np
+
+from arm.controllers.base import Controller
+from tasks.task import Task
+
+"""
+Compact binary snapshots of a simulation, and a memory-mapped
+log of them for deterministic replay
+
+A snapshot holds everything a tick depends on: the tick count,
+every ball's position, velocity, acceleration, holder and sleep
+state, every arm's joints, the position in the task list with the
+progress of the current task, the state the controllers carry
+between updates (see Controller.get_state) and the global numpy
+random state (the scenes use it for their random impulses). The
+layout is a numpy structured dtype, so each snapshot is one
+fixed-size record and frame k of a log is found by offset alone.
+
+A CachedController puts its whole cache in every snapshot, so give
+it a small maxsize when recording long runs.
+
+Usage:
+    log = SnapshotLog.create("run.snap", snapshot_dtype(sim))
+    sim.set_snapshot_log(log)
+    sim.run_until(...)
+
+    # Later, in a new simulation of the same scene
+    log = SnapshotLog.open("run.snap")
+    restore_snapshot(sim, log[700])
+    sim.step(100)
+"""
+
+# The size in bytes of the log header, before the first record
+HEADER_SIZE = 4096
+MAGIC = b"SIMSNAP1"
+# Length of the MT19937 key
+RNG_KEY_SIZE = 624
+
+
+def snapshot_dtype(sim: Any) -> np.dtype:
+    """
+    Get the record layout of a simulation's snapshots, which
+    depends on the number of balls, joints and tasks
+
+    Args:
+    - sim: The simulation, with its scene set
+
+    Returns:
+    - The structured dtype of one snapshot
+    """
+    num_balls = len(sim.objects.get_balls())
+    num_joints = sum(arm.num_links for arm in sim.objects.arms)
+    controller_size = sum(len(controller.get_state(sim.objects.arms)) for controller in _controllers(sim))
+
+    return np.dtype([
+        ("tick", np.int64),
+        ("time", np.float64),
+        ("ball_pos", np.float64, (num_balls, 2)),
+        ("ball_vel", np.float64, (num_balls, 2)),
+        ("ball_acc", np.float64, (num_balls, 2)),
+        # Index of the arm holding each ball, -1 if it's free
+        ("ball_holder", np.int16, (num_balls,)),
+        ("ball_asleep", np.bool_, (num_balls,)),
+        ("ball_still_steps", np.int32, (num_balls,)),
+        ("ball_rest_pos", np.float64, (num_balls, 2)),
+        ("joints", np.float64, (num_joints,)),
+        ("task_position", np.int32),
+        ("task_current", np.bool_),
+        ("task_state", np.float64, (Task.STATE_SIZE,)),
+        ("controller_state", np.float64, (controller_size,)),
+        ("rng_key", np.uint32, (RNG_KEY_SIZE,)),
+        ("rng_pos", np.int32),
+        ("rng_has_gauss", np.int32),
+        ("rng_gauss", np.float64),
+    ])
+
+
+def take_snapshot(sim: Any, dtype: Optional[np.dtype] = None) -> np.ndarray:
+    """
+    Take a snapshot of a simulation
+
+    Args:
+    - sim: The simulation
+    - dtype: The record layout, from snapshot_dtype
+
+    Returns:
+    - The snapshot, a single record (its tobytes() is the binary blob)
+    """
+    snapshot = np.zeros((), dtype=dtype or snapshot_dtype(sim))
+    balls = sim.objects.get_balls()
+    arms = sim.objects.arms
+
+    snapshot["tick"] = sim.ticks
+    snapshot["time"] = sim.time
+
+    if balls:
+        snapshot["ball_pos"] = [ball.pos for ball in balls]
+        snapshot["ball_vel"] = [ball.vel for ball in balls]
+        snapshot["ball_acc"] = [ball.acc for ball in balls]
+        snapshot["ball_holder"] = [arms.index(ball.holder) if ball.held else -1 for ball in balls]
+        snapshot["ball_asleep"] = [ball.asleep for ball in balls]
+        snapshot["ball_still_steps"] = [ball.still_steps for ball in balls]
+        snapshot["ball_rest_pos"] = [ball.rest_pos for ball in balls]
+
+    if arms:
+        snapshot["joints"] = np.concatenate([arm.joints for arm in arms])
+
+    task_manager = getattr(sim.scene, "taskManager", None)
+    if task_manager is not None:
+        snapshot["task_position"] = task_manager.position
+        snapshot["task_current"] = task_manager.current_task is not None
+        if task_manager.current_task is not None:
+            snapshot["task_state"] = task_manager.current_task.get_state()
+
+    controllers = _controllers(sim)
+    if controllers:
+        snapshot["controller_state"] = np.concatenate([controller.get_state(arms) for controller in controllers])
+
+    _, key, pos, has_gauss, gauss = np.random.get_state()
+    snapshot["rng_key"] = key
+    snapshot["rng_pos"] = pos
+    snapshot["rng_has_gauss"] = has_gauss
+    snapshot["rng_gauss"] = gauss
+
+    return snapshot
+
+
+def restore_snapshot(sim: Any, snapshot: np.ndarray) -> None:
+    """
+    Put a simulation back in the state of a snapshot, so
+    stepping it carries on exactly as it did from there
+
+    Args:
+    - sim: The simulation, with the same scene the snapshot was taken of
+    - snapshot: The snapshot
+    """
+    balls = sim.objects.get_balls()
+    arms = sim.objects.arms
+
+    if snapshot.dtype != snapshot_dtype(sim):
+        raise ValueError("snapshot was taken of a different scene")
+
+    sim.ticks = int(snapshot["tick"])
+    sim.time = float(snapshot["time"])
+
+    for k, ball in enumerate(balls):
+        holder = int(snapshot["ball_holder"][k])
+        # Before the sleep state, as this wakes the ball
+        ball.set_held(holder >= 0, arms[holder] if holder >= 0 else None)
+
+        ball.pos = snapshot["ball_pos"][k].copy()
+        ball.vel = snapshot["ball_vel"][k].copy()
+        ball.acc = snapshot["ball_acc"][k].copy()
+        ball.asleep = bool(snapshot["ball_asleep"][k])
+        ball.still_steps = int(snapshot["ball_still_steps"][k])
+        ball.rest_pos = snapshot["ball_rest_pos"][k].copy()
+
+    start = 0
+    for arm in arms:
+        arm.set_joints(snapshot["joints"][start:start + arm.num_links])
+        start += arm.num_links
+
+    # Balls in the hashmap need to be in the cells of their new positions
+    sim.objects.reindex()
+
+    task_manager = getattr(sim.scene, "taskManager", None)
+    if task_manager is not None:
+        task_manager.restore(
+            int(snapshot["task_position"]),
+            bool(snapshot["task_current"]),
+            snapshot["task_state"],
+        )
+
+    start = 0
+    for controller in _controllers(sim):
+        size = len(controller.get_state(arms))
+        controller.set_state(arms, snapshot["controller_state"][start:start + size])
+        start += size
+
+    np.random.set_state((
+        "MT19937",
+        snapshot["rng_key"].copy(),
+        int(snapshot["rng_pos"]),
+        int(snapshot["rng_has_gauss"]),
+        float(snapshot["rng_gauss"]),
+    ))
+
+
+def _controllers(sim: Any) -> List[Controller]:
+    """
+    Get the controllers of a simulation, each once
+    """
+    controllers = []
+    for controller in (getattr(sim.scene, "controller", None), sim.objects.batch_controller):
+        if controller is not None and not any(controller is other for other in controllers):
+            controllers.append(controller)
+    return controllers
+
+
+class SnapshotLog:
+    """
+    Append-only log of snapshots in a memory-mapped file
+
+    The file is a fixed-size header (magic, record count and the
+    record dtype as JSON) followed by the records back to back, so
+    any frame is read straight from its offset. The file grows by
+    doubling, and is trimmed to the records written on close.
+    """
+    # Records the file has room for when created
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, path: str, dtype: np.dtype, count: int, writable: bool) -> None:
+        """
+        Open a log, use create or open instead
+        """
+        self.path = path
+        self.dtype = dtype
+        self.count = count
+        self.writable = writable
+
+        self.__map(os.path.getsize(path))
+
+    @staticmethod
+    def create(path: str, dtype: np.dtype) -> "SnapshotLog":
+        """
+        Create a new empty log, replacing any file at path
+
+        Args:
+        - path: The file
+        - dtype: The record layout, from snapshot_dtype
+
+        Returns:
+        - The log, open for appending
+        """
+        descr = json.dumps(np.lib.format.dtype_to_descr(dtype)).encode()
+        if len(MAGIC) + 16 + len(descr) > HEADER_SIZE:
+            raise ValueError("snapshot dtype is too large for the log header")
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(0).tobytes())
+            f.write(np.uint64(len(descr)).tobytes())
+            f.write(descr)
+            f.truncate(HEADER_SIZE + SnapshotLog.INITIAL_CAPACITY * dtype.itemsize)
+
+        return SnapshotLog(path, dtype, 0, writable=True)
+
+    @staticmethod
+    def open(path: str, writable: bool = False) -> "SnapshotLog":
+        """
+        Open an existing log
+
+        Args:
+        - path: The file
+        - writable: Open it for appending more snapshots
+
+        Returns:
+        - The log
+        """
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot log")
+
+        count, size = np.frombuffer(header[len(MAGIC):len(MAGIC) + 16], dtype=np.uint64)
+        descr = json.loads(header[len(MAGIC) + 16:len(MAGIC) + 16 + int(size)])
+        dtype = _descr_to_dtype(descr)
+
+        return SnapshotLog(path, dtype, int(count), writable)
+
+    def __map(self, file_size: int) -> None:
+        """
+        Memory-map the header count and every record the file has room for
+        """
+        mode = "r+" if self.writable else "r"
+        capacity = (file_size - HEADER_SIZE) // self.dtype.itemsize
+
+        self.__count = np.memmap(self.path, dtype=np.uint64, mode=mode, offset=len(MAGIC), shape=(1,))
+        self.records = np.memmap(self.path, dtype=self.dtype, mode=mode, offset=HEADER_SIZE, shape=(capacity,))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, frame: int) -> np.ndarray:
+        """
+        Get a snapshot by frame, in O(1)
+
+        Args:
+        - frame: The index of the snapshot, negative counts from the end
+
+        Returns:
+        - The snapshot, a view into the file
+        """
+        if frame < 0:
+            frame += self.count
+        if not 0 <= frame < self.count:
+            raise IndexError(f"frame {frame} is not in the log of {self.count}")
+        return self.records[frame]
+
+    def append(self, snapshot: np.ndarray) -> None:
+        """
+        Add a snapshot to the end of the log
+
+        Args:
+        - snapshot: The snapshot, from take_snapshot
+        """
+        if not self.writable:
+            raise ValueError("log is open read-only")
+
+        if self.count == len(self.records):
+            self.__grow()
+
+        self.records[self.count] = snapshot
+        self.count += 1
+        self.__count[0] = self.count
+
+    def __grow(self) -> None:
+        """
+        Double the room in the file
+        """
+        self.records.flush()
+        capacity = 2 * max(len(self.records), 1)
+        del self.records, self.__count
+
+        size = HEADER_SIZE + capacity * self.dtype.itemsize
+        with open(self.path, "r+b") as f:
+            f.truncate(size)
+        self.__map(size)
+
+    def close(self) -> None:
+        """
+        Write everything to disk, trimming the unused room
+        """
+        if self.writable:
+            self.records.flush()
+            self.__count.flush()
+        del self.records, self.__count
+
+        if self.writable:
+            with open(self.path, "r+b") as f:
+                f.truncate(HEADER_SIZE + self.count * self.dtype.itemsize)
+
+
+def _descr_to_dtype(descr: List[List[Any]]) -> np.dtype:
+    """
+    Rebuild a structured dtype from its description,
+    after JSON has turned its tuples into lists
+    """
+    fields = []
+    for name, fmt, *shape in descr:
+        fields.append((name, fmt, tuple(shape[0])) if shape else (name, fmt))
+    return np.dtype(fields)
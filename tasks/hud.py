@@ -0,0 +1,50 @@
+from typing import *
+from collections import OrderedDict
+import pygame
+
+import constants as const
+
+"""
+This module contains the HudText class, which caches
+the rendered lines of text drawn over the simulation
+"""
+
+class HudText:
+    # Rendered lines kept around for reuse
+    MAX_LINES = 64
+
+    def __init__(self, font: pygame.font.Font = const.FONT, colour: Tuple[int, int, int] = (255, 255, 255)) -> None:
+        """
+        Create a new text cache
+
+        Args:
+        - font: The font to render with
+        - colour: The colour of the text
+        """
+        self.font = font
+        self.colour = colour
+        # Rendered surface of each recent line, least recently used first
+        self.lines: OrderedDict[str, pygame.Surface] = OrderedDict()
+
+    def render(self, text: str) -> pygame.Surface:
+        """
+        Get a line of text rendered, only rendering
+        it if it hasn't been recently
+
+        Args:
+        - text: The line of text
+
+        Returns:
+        - The rendered text
+        """
+        surface = self.lines.get(text)
+        if surface is not None:
+            self.lines.move_to_end(text)
+            return surface
+
+        surface = self.font.render(text, True, self.colour)
+        self.lines[text] = surface
+        if len(self.lines) > HudText.MAX_LINES:
+            self.lines.popitem(last=False)
+
+        return surface
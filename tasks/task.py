@@ -11,17 +11,57 @@ class Task:
     """
     Base task object
     """
+    # Length of the state vector of every task (see get_state)
+    STATE_SIZE = 4
+
     def __init__(self, controller: Controller, arm: Arm):
         self.done = False
         self.controller = controller
         self.arm = arm
     
+    def get_state(self) -> np.ndarray:
+        """
+        Get the progress of the task, for snapshots
+
+        Returns:
+        - The state, shape (STATE_SIZE,), all zeros before
+          the task is first updated
+        """
+        state = np.zeros(Task.STATE_SIZE, dtype=np.float64)
+        state[0] = self.done
+        return state
+
+    def set_state(self, state: np.ndarray) -> None:
+        """
+        Restore the progress of the task from get_state
+
+        Args:
+        - state: The state, all zeros to reset the task
+        """
+        self.done = bool(state[0])
+    
     def update(self) -> None:
         """
         Check if the task is done
         """
         raise NotImplementedError
 
+    def move_towards(self, target: np.ndarray) -> bool:
+        """
+        Use the controller to move the arm towards a target,
+        giving up on the task if the target is out of reach
+
+        Returns:
+        - If the arm was moved
+        """
+        if not self.controller.is_reachable(self.arm, target):
+            print(f"Target {round(target[0])}, {round(target[1])} is out of reach!")
+            self.done = True
+            return False
+
+        self.controller.update(self.arm, target)
+        return True
+
     def __str__(self) -> str:
         return self.__class__.__name__
 
@@ -36,7 +76,8 @@ class HoldBall(Task):
 
     def update(self) -> None:
         # Use controller to move the arm
-        self.controller.update(self.arm, self.ball.pos)
+        if not self.move_towards(self.ball.pos):
+            return
 
         # Check if the ball is touching arm's end effector
         ballpos = self.ball.pos
@@ -60,7 +101,8 @@ class MoveArm(Task):
     
     def update(self) -> None:
         # Use controller to move the arm
-        self.controller.update(self.arm, self.target)
+        if not self.move_towards(self.target):
+            return
 
         # Check if the arm is at the target
         armpos = self.arm.get_end_effector_pos()
@@ -81,6 +123,18 @@ class MoveRelative(Task):
         self.target = None
         self.updated = False
 
+    def get_state(self) -> np.ndarray:
+        state = super().get_state()
+        state[1] = self.updated
+        if self.updated:
+            state[2:4] = self.target
+        return state
+
+    def set_state(self, state: np.ndarray) -> None:
+        super().set_state(state)
+        self.updated = bool(state[1])
+        self.target = state[2:4].copy() if self.updated else None
+
     def update(self) -> None:
         # on first update, set the target
         if self.updated == False:
@@ -88,7 +142,8 @@ class MoveRelative(Task):
             self.updated = True
 
         # Use controller to move the arm
-        self.controller.update(self.arm, self.target)
+        if not self.move_towards(self.target):
+            return
 
         # Check if the arm is at the target
         armpos = self.arm.get_end_effector_pos()
@@ -114,7 +169,8 @@ class MoveToBall(Task):
     
     def update(self) -> None:
         # Use controller to move the arm
-        self.controller.update(self.arm, self.ball.pos)
+        if not self.move_towards(self.ball.pos):
+            return
 
         # Check if the arm is touching the ball
         armpos = self.arm.get_end_effector_pos()
@@ -145,7 +201,9 @@ class ReleaseBall(Task):
             self.ball.vel = np.zeros(2, dtype=np.float64)
             self.ball.acc = np.zeros(2, dtype=np.float64)
         else:
+            # e.g. the ball was out of reach, nothing to release
             print("Ball is not being held!")
+            self.done = True
 
 
 class Wait(Task):
@@ -156,6 +214,15 @@ class Wait(Task):
         super().__init__(controller, arm)
         self.time = time
         self.timer = 0
+
+    def get_state(self) -> np.ndarray:
+        state = super().get_state()
+        state[1] = self.timer
+        return state
+
+    def set_state(self, state: np.ndarray) -> None:
+        super().set_state(state)
+        self.timer = int(state[1])
     
     def update(self) -> None:
         self.timer += 1
@@ -1,8 +1,10 @@
 from typing import *
 from queue import Queue
+import numpy as np
 import pygame
 
 from tasks.task import Task
+from tasks.hud import HudText
 from arm.arm import Arm
 import constants as const
 
@@ -11,12 +13,24 @@ class TaskManager:
         self.tasks = Queue()
         self.arm = arm
         self.current_task = None
+
+        # Every task added, and how many have been taken from the queue
+        self.history: List[Task] = []
+        self.position = 0
+
+        # The task description on screen, refreshed every
+        # HUD_REFRESH_FRAMES frames and when the task changes
+        self.hud = HudText()
+        self.hud_task = None
+        self.hud_text = ""
+        self.hud_age = 0
     
     def add_task(self, task: Task) -> None:
         """
         Add a task to the queue
         """
         self.tasks.put(task)
+        self.history.append(task)
         print("Added task:", task)
     
     def add_tasks(self, tasks: List[Task]) -> None:
@@ -36,18 +50,61 @@ class TaskManager:
         if self.current_task is None:
             if not self.tasks.empty():
                 self.current_task = self.tasks.get()
+                self.position += 1
         else:
             self.current_task.update()
             if self.current_task.done:
                 self.current_task = None
 
-    def draw(self, surface: pygame.Surface) -> None:
+    def restore(self, position: int, current: bool, state: np.ndarray) -> None:
+        """
+        Go back (or forward) to a point in the task list,
+        e.g. from a snapshot
+
+        Args:
+        - position: How many tasks had been taken from the queue
+        - current: If the last of those was still being handled
+        - state: The state of that task (see Task.get_state)
+        """
+        self.position = position
+        self.current_task = self.history[position - 1] if current else None
+
+        # Every task from here on starts over
+        for task in self.history[position - 1 if current else position:]:
+            task.set_state(np.zeros(Task.STATE_SIZE))
+        if current:
+            self.current_task.set_state(state)
+
+        self.tasks = Queue()
+        for task in self.history[position:]:
+            self.tasks.put(task)
+
+    @property
+    def done(self) -> bool:
+        """
+        If every task has been handled
+        """
+        return self.current_task is None and self.tasks.empty()
+
+    def draw(self, surface: pygame.Surface) -> Optional[pygame.Rect]:
         """
         Draw text in the top-left displaying the
         current task:
 
         "Current task: <task name>"
+
+        Returns:
+        - The area drawn on, if anything was drawn
         """
-        if self.current_task is not None:
-            text = const.FONT.render("Current task: " + str(self.current_task), True, (255, 255, 255))
-            surface.blit(text, (10, 10))
\ No newline at end of file
+        if self.current_task is None:
+            return None
+
+        # Task descriptions are costly to build, so only
+        # refresh them every few frames
+        self.hud_age += 1
+        if self.current_task is not self.hud_task or self.hud_age >= const.HUD_REFRESH_FRAMES:
+            self.hud_task = self.current_task
+            self.hud_text = "Current task: " + str(self.current_task)
+            self.hud_age = 0
+
+        return surface.blit(self.hud.render(self.hud_text), (10, 10))
\ No newline at end of file
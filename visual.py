@@ -18,6 +18,10 @@ arm.set_joint_angles(angles: np.ndarray) -> None
 arm.get_end_effector_pos() -> np.ndarray
     This method returns the position of the end effector
     of the arm
+
+arm.forward_kinematics(configs: np.ndarray) -> np.ndarray
+    This method returns the end effector position of each
+    joint configuration without moving the arm
 """
 
 # Target position
@@ -49,20 +53,13 @@ joint2_angles = np.linspace(ROT_START, ROT_END, POINTS)
 # Create a grid of joint angles
 joint1_angles, joint2_angles = np.meshgrid(joint1_angles, joint2_angles)
 
-# Create a grid of distances from the target
-distances = np.zeros((POINTS, POINTS))
-
-for i in range(POINTS):
-    for j in range(POINTS):
-        # Set the joint angles
-        arm.set_joint_angles(np.array([joint1_angles[i, j], joint2_angles[i, j]]))
-        
-        # Get the end effector position
-        end_effector_pos = arm.get_end_effector_pos()
-        
-        # Calculate the distance from the target
-        # (target - end point)^2
-        distances[i, j] = np.linalg.norm(end_effector_pos - target)
+# Compute the end effector position of every configuration at once
+configs = np.stack([joint1_angles.ravel(), joint2_angles.ravel()], axis=1)
+end_effector_pos = arm.forward_kinematics(configs)
+
+# Calculate the distance from the target
+# (target - end point)^2
+distances = np.linalg.norm(end_effector_pos - target, axis=1).reshape(POINTS, POINTS)
 
 
 # Now we're going to attempt to do gradient descent